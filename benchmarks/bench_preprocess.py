@@ -0,0 +1,66 @@
+"""
+    Compare the throughput of `preprocess_text` with the original step by
+    step preprocessing (six `re.sub` calls per tweet).
+
+    Run from the root directory of the project:
+
+        python -m benchmarks.bench_preprocess --rows 200000
+"""
+import argparse
+import re
+import time
+
+from twitter_processor import twitter_processor
+from benchmarks.synthetic import generate_tweets
+
+
+def step_by_step_preprocess(dataset, text_col='text'):
+    """
+        The original implementation of `preprocess_text`.
+    """
+    for data in dataset:
+        data[text_col] = re.sub(r'http\S+|www\S+', '', data[text_col])
+        data[text_col] = re.sub(r'[^\x00-\x7F]+', '', data[text_col])
+        data[text_col] = re.sub(r'[@;:\']\b\S+\b', '', data[text_col])
+        data[text_col] = re.sub(r'[^a-zA-Z0-9\s]', '', data[text_col])
+        data[text_col] = re.sub(r'\d+', '', data[text_col])
+        data[text_col] = data[text_col].lower().strip()
+
+
+def make_dataset(rows, seed=0):
+    """
+        Build a dataset of synthetic tweets with only the text column.
+    """
+    return [{'text': tweet['text']} for tweet in generate_tweets(rows, seed)]
+
+
+def measure(function, rows, repeat):
+    """
+        Return the best throughput of `function` in tweets/second.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        dataset = make_dataset(rows)
+        start = time.perf_counter()
+        function(dataset)
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    expected = make_dataset(1000)
+    step_by_step_preprocess(expected)
+    actual = make_dataset(1000)
+    twitter_processor.preprocess_text(actual)
+    assert actual == expected, 'outputs differ'
+
+    baseline = measure(step_by_step_preprocess, args.rows, args.repeat)
+    fused = measure(twitter_processor.preprocess_text, args.rows, args.repeat)
+    print(f'step by step: {baseline:12,.0f} tweets/s')
+    print(f'fused:        {fused:12,.0f} tweets/s')
+    print(f'speedup:      {fused / baseline:12.2f}x')
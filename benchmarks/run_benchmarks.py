@@ -0,0 +1,241 @@
+"""
+    Benchmark every stage of the twitter_processor pipeline on synthetic
+    tweets and save the results as JSON.
+
+    Each stage runs in a fresh process, after the stages it depends on, so
+    its peak resident memory is measured in isolation. Run from the root
+    directory of the project:
+
+        python -m benchmarks.run_benchmarks --sizes 10000 1000000 10000000
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue as queues
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+from twitter_processor import twitter_processor
+from benchmarks.synthetic import write_synthetic_csv
+
+# Maximum time in seconds to wait for the result of a stage
+STAGE_TIMEOUT = 3600
+
+# Stage name: (stages to run before it, function running it)
+STAGES = {
+    'load_data': (
+        [], lambda dataset, file, tmp_dir:
+        twitter_processor.load_data(file)),
+    'preprocess_text': (
+        [], lambda dataset, file, tmp_dir:
+        twitter_processor.preprocess_text(dataset)),
+    'remove_stopwords': (
+        ['preprocess_text'], lambda dataset, file, tmp_dir:
+        twitter_processor.remove_stopwords(dataset)),
+    'get_term_frequencies': (
+        ['preprocess_text', 'remove_stopwords'],
+        lambda dataset, file, tmp_dir:
+        twitter_processor.get_term_frequencies(dataset)),
+    'get_vocabulary': (
+        ['preprocess_text', 'remove_stopwords'],
+        lambda dataset, file, tmp_dir:
+        twitter_processor.get_vocabulary(dataset)),
+    'get_cluster_term_frequencies': (
+        ['preprocess_text', 'remove_stopwords'],
+        lambda dataset, file, tmp_dir:
+        twitter_processor.get_cluster_term_frequencies(dataset)),
+    'write_to_csv': (
+        ['preprocess_text', 'remove_stopwords', 'add_term_frequency_col'],
+        lambda dataset, file, tmp_dir:
+        twitter_processor.write_to_csv(
+            dataset, os.path.join(tmp_dir, 'processed.csv'))),
+    'stream_to_csv': (
+        ['preprocess_text', 'remove_stopwords', 'add_term_frequency_col'],
+        lambda dataset, file, tmp_dir:
+        twitter_processor.stream_to_csv(
+            iter(dataset), os.path.join(tmp_dir, 'processed_stream.csv'))),
+}
+
+
+def _add_term_frequency_col(dataset):
+    twitter_processor.add_term_frequency_col(
+        dataset, twitter_processor.get_term_frequencies(dataset))
+
+
+SETUP = {
+    'preprocess_text': twitter_processor.preprocess_text,
+    'remove_stopwords': twitter_processor.remove_stopwords,
+    'add_term_frequency_col': _add_term_frequency_col,
+}
+
+
+def peak_rss_mb():
+    """
+        Return the peak resident memory of the current process, in MB, or
+        None if it cannot be measured.
+
+        The `resource` module only exists on Unix. Elsewhere, e.g. on
+        Windows, the optional psutil package is used if it is installed.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        # The peak working set is only reported on Windows
+        return getattr(memory, 'peak_wset', memory.rss) / 2 ** 20
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    scale = 1 if platform.system() == 'Darwin' else 1024
+    return peak * scale / 2 ** 20
+
+
+def run_stage(stage, file, rows, tmp_dir, queue):
+    """
+        Run one stage in the current process and put its measures in the
+        queue.
+    """
+    setup, function = STAGES[stage]
+    dataset = None
+    if stage != 'load_data':
+        dataset = twitter_processor.load_data(file)
+        for name in setup:
+            SETUP[name](dataset)
+    rss_before = peak_rss_mb()
+
+    with redirect_stdout(io.StringIO()):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        function(dataset, file, tmp_dir)
+        seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+
+    queue.put({'stage': stage,
+               'rows': rows,
+               'seconds': seconds,
+               'cpu_seconds': cpu_seconds,
+               'rows_per_second': rows / seconds if seconds else None,
+               'peak_rss_mb': peak_rss_mb(),
+               'setup_peak_rss_mb': rss_before})
+
+
+def wait_for_result(process, queue, timeout=STAGE_TIMEOUT):
+    """
+        Wait for the measures of a stage running in another process.
+
+        Raises:
+            RuntimeError: If the process exits without a result, e.g. when it
+                          crashes, or does not finish within `timeout`
+                          seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except queues.Empty:
+            if process.exitcode is not None:
+                # The result may have been queued just before exiting
+                try:
+                    return queue.get(timeout=1)
+                except queues.Empty:
+                    raise RuntimeError(
+                        f"the stage process exited with code "
+                        f"{process.exitcode} without a result") from None
+            if time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(
+                    f"the stage did not finish in {timeout} seconds")
+
+
+def benchmark(sizes, stages, label_skew=0.5, seed=0):
+    """
+        Run the benchmarks and return their results.
+
+        Args:
+            sizes (list): Numbers of rows to benchmark.
+            stages (list): Names of the stages to benchmark.
+            label_skew (float): Fraction of positive tweets.
+            seed (int): Seed of the synthetic tweets.
+
+        Returns:
+            list: One dictionary of measures per size and stage.
+
+        Raises:
+            RuntimeError: If a stage crashes or times out.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            file = os.path.join(tmp_dir, f'tweets_{rows}.csv')
+            write_synthetic_csv(file, rows, seed=seed, label_skew=label_skew)
+            for stage in stages:
+                queue = context.Queue()
+                process = context.Process(target=run_stage, args=(
+                    stage, file, rows, tmp_dir, queue))
+                process.start()
+                try:
+                    result = wait_for_result(process, queue)
+                except RuntimeError as error:
+                    raise RuntimeError(f"{stage} on {rows:,} rows: {error}")
+                finally:
+                    process.join()
+                results.append(result)
+                rows_per_second = result['rows_per_second']
+                rate = f"{rows_per_second:>14,.0f}" \
+                    if rows_per_second is not None else f"{'-':>14}"
+                peak = result['peak_rss_mb']
+                memory = f"{peak:9.1f}" if peak is not None else f"{'-':>9}"
+                print(f"{stage:>30} {rows:>10,} rows "
+                      f"{result['seconds']:9.3f} s "
+                      f"{rate} rows/s "
+                      f"{memory} MB")
+            os.remove(file)
+    return results
+
+
+def git_revision():
+    """
+        Return the current git revision, or None outside a repository.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 1000000, 10000000])
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES),
+                        default=list(STAGES))
+    parser.add_argument('--label-skew', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    report = {'revision': git_revision(),
+              'timestamp': datetime.now(timezone.utc).isoformat(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'label_skew': args.label_skew,
+              'seed': args.seed,
+              'results': benchmark(args.sizes, args.stages, args.label_skew,
+                                   args.seed)}
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults saved to {args.output}")
@@ -0,0 +1,97 @@
+"""
+    Synthetic tweets for the benchmarks, with the columns of the Twitter
+    dataset and the kind of noise the preprocessing has to remove: URLs,
+    mentions, hashtags, emoji, numbers and punctuation.
+"""
+import csv
+import random
+
+FIELDNAMES = ['sentiment', 'id', 'date', 'query', 'user', 'text']
+
+WORDS = ['love', 'hate', 'today', 'work', 'happy', 'sad', 'good', 'bad',
+         'morning', 'night', 'great', 'awful', 'music', 'movie', 'friends',
+         'school', 'weekend', 'tired', 'excited', 'home', 'coffee', 'rain',
+         'sun', 'game', 'lol', 'omg', 'thanks', 'sorry', 'miss', 'wait']
+STOPWORDS = ['i', 'the', 'is', 'a', 'to', 'my', 'and', 'it', 'you', 'this',
+             'so', 'for', 'of', 'in', 'just', 'not', 'me', 'on', 'at', 'be']
+EMOJI = ['\U0001f600', '\U0001f622', '\u2764\ufe0f', '\U0001f44d',
+         '\U0001f525', 'caf\u00e9', '\u00bfqu\u00e9?']
+PUNCTUATION = ['!', '!!', '?', '...', ',', '.', ':)', ':(', ';)']
+
+
+def _noise(rng, vocabulary_size):
+    """
+        Return one random token, which may be noise.
+    """
+    kind = rng.random()
+    if kind < 0.04:
+        return f'http://t.co/{rng.getrandbits(32):08x}'
+    if kind < 0.06:
+        return f'www.site{rng.randrange(100)}.com/page'
+    if kind < 0.12:
+        return f'@user{rng.randrange(10000)}'
+    if kind < 0.16:
+        return f'#{rng.choice(WORDS)}'
+    if kind < 0.19:
+        return rng.choice(EMOJI)
+    if kind < 0.22:
+        return str(rng.randrange(1, 2024))
+    if kind < 0.26:
+        return rng.choice(WORDS) + rng.choice(PUNCTUATION)
+    if kind < 0.55:
+        return rng.choice(STOPWORDS)
+    if kind < 0.65:
+        # Long tail of rare words, to grow the vocabulary with the size
+        return f'word{rng.randrange(vocabulary_size)}'
+    word = rng.choice(WORDS)
+    return word.upper() if kind > 0.97 else word
+
+
+def generate_tweets(rows, seed=0, label_skew=0.5, min_words=3, max_words=25,
+                    vocabulary_size=50000, empty_ratio=0.01):
+    """
+        Generate synthetic tweets.
+
+        Args:
+            rows (int): Number of tweets.
+            seed (int): Seed of the random generator, so runs are
+                        reproducible.
+            label_skew (float): Fraction of tweets with the positive ('4')
+                                label; the rest are negative ('0').
+            min_words (int): Minimum number of tokens per tweet.
+            max_words (int): Maximum number of tokens per tweet.
+            vocabulary_size (int): Number of distinct rare words.
+            empty_ratio (float): Fraction of tweets made only of noise that
+                                 the preprocessing removes completely.
+
+        Yields:
+            dict: One tweet with the columns in `FIELDNAMES`.
+    """
+    rng = random.Random(seed)
+    for i in range(rows):
+        if rng.random() < empty_ratio:
+            text = f'@user{rng.randrange(10000)} http://t.co/x'
+        else:
+            text = ' '.join(_noise(rng, vocabulary_size)
+                            for _ in range(rng.randint(min_words, max_words)))
+        yield {'sentiment': '4' if rng.random() < label_skew else '0',
+               'id': str(1467810369 + i),
+               'date': 'Mon Apr 06 22:19:45 PDT 2009',
+               'query': 'NO_QUERY',
+               'user': f'user{rng.randrange(100000)}',
+               'text': text}
+
+
+def write_synthetic_csv(file, rows, **kwargs):
+    """
+        Write synthetic tweets to a CSV file.
+
+        Args:
+            file (str): Path to the output CSV file.
+            rows (int): Number of tweets.
+            **kwargs: Options of `generate_tweets`.
+    """
+    with open(file, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.DictWriter(output, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(generate_tweets(rows, **kwargs))
@@ -11,7 +11,11 @@ setup(
         'nltk',
         'wordcloud',
         'matplotlib',
+        'numpy',
         'unittest',
         'coverage'
     ],
+    extras_require={
+        'parquet': ['pyarrow'],
+    },
 )
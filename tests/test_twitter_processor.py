@@ -2,10 +2,47 @@ import unittest
 from unittest import TestCase
 from unittest.mock import patch
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gzip
+import json
+import numpy
+import os
+import random
+import re
+import socket
+import tempfile
+import zipfile
 
 from twitter_processor import twitter_processor
 
 
+def reference_preprocess(text):
+    """
+        The step by step preprocessing that `normalize_text` must reproduce.
+    """
+    text = re.sub(r'http\S+|www\S+', '', text)
+    text = re.sub(r'[^\x00-\x7F]+', '', text)
+    text = re.sub(r'[@;:\']\b\S+\b', '', text)
+    text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
+    text = re.sub(r'\d+', '', text)
+    return text.lower().strip()
+
+
+def has_ipv6_loopback():
+    """
+        Whether sockets can be bound to the IPv6 loopback address.
+    """
+    if not socket.has_ipv6:
+        return False
+    try:
+        with socket.socket(socket.AF_INET6) as sock:
+            sock.bind(('::1', 0))
+    except OSError:
+        return False
+    return True
+
+
 class TestTwitterProcessor(TestCase):
     def test_load_data(self):
         with patch('builtins.open', unittest.mock.mock_open(
@@ -14,6 +51,228 @@ class TestTwitterProcessor(TestCase):
             self.assertEqual(dataset, [{'col1': 'val1', 'col2':
                                         'val2', 'col3': 'val3'}])
 
+    def test_iter_data(self):
+        with patch('builtins.open', unittest.mock.mock_open(
+                    read_data='col1,col2\nval1,val2\nval3,val4\nval5,val6')):
+            batches = list(twitter_processor.iter_data(file='test.csv',
+                                                       chunk_size=2))
+            self.assertEqual(batches, [[{'col1': 'val1', 'col2': 'val2'},
+                                        {'col1': 'val3', 'col2': 'val4'}],
+                                       [{'col1': 'val5', 'col2': 'val6'}]])
+
+    def test_write_to_csv_append(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'processed.csv')
+            with patch('sys.stdout', new=StringIO()):
+                twitter_processor.write_to_csv([{'text': 'first'}],
+                                               output_file)
+                twitter_processor.write_to_csv([{'text': 'second'}],
+                                               output_file, append=True)
+            dataset = twitter_processor.load_data(file=output_file)
+            self.assertEqual(dataset, [{'text': 'first'}, {'text': 'second'}])
+
+    def test_stream_to_csv(self):
+        dataset = [{'text': 'hello world hello', 'sentiment': '0',
+                    'term_frequency': {'hello': 2, 'world': 1}},
+                   {'text': '', 'sentiment': '4', 'term_frequency': {}},
+                   {'text': 'caf, "x"', 'sentiment': '4',
+                    'term_frequency': {'caf': 1, 'x': 1}}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for encoding in twitter_processor.TERM_FREQUENCY_ENCODINGS:
+                for name in ('processed.csv', 'processed.csv.gz'):
+                    output_file = os.path.join(tmp_dir, encoding + name)
+                    vocabulary = twitter_processor.Vocabulary()
+                    num_rows = twitter_processor.stream_to_csv(
+                        iter(dataset[:2]), output_file, encoding=encoding,
+                        vocabulary=vocabulary)
+                    twitter_processor.stream_to_csv(
+                        iter(dataset[2:]), output_file, encoding=encoding,
+                        vocabulary=vocabulary, append=True)
+                    vocabulary_file = os.path.join(tmp_dir, 'vocabulary.txt')
+                    vocabulary.save(vocabulary_file)
+                    vocabulary = twitter_processor.Vocabulary.load(
+                        vocabulary_file)
+                    batches = list(twitter_processor.iter_processed_data(
+                        output_file, encoding=encoding, vocabulary=vocabulary,
+                        chunk_size=2))
+                    self.assertEqual(num_rows, 2)
+                    self.assertEqual(batches, [dataset[:2], dataset[2:]])
+
+            output_file = os.path.join(tmp_dir, 'processed.csv')
+            twitter_processor.stream_to_csv(iter(dataset), output_file)
+            with open(output_file, encoding='utf-8', newline='') as file:
+                self.assertEqual(file.readline(),
+                                 'text,sentiment,term_frequency\r\n')
+                self.assertEqual(file.readline(),
+                                 'hello world hello,0,hello:2 world:1\r\n')
+
+            # An empty input still replaces the previous content
+            self.assertEqual(
+                twitter_processor.stream_to_csv(iter([]), output_file), 0)
+            self.assertEqual(os.path.getsize(output_file), 0)
+
+            with open(output_file, 'w', encoding='utf-8',
+                      newline='') as file:
+                file.write('text,term_frequency\r\nhi,hi:1\r\n\r\n')
+            self.assertEqual(
+                list(twitter_processor.iter_processed_data(output_file)),
+                [[{'text': 'hi', 'term_frequency': {'hi': 1}}]])
+
+    @unittest.skipIf(twitter_processor.pq is None, "pyarrow is not installed")
+    def test_write_parquet(self):
+        dataset = [{'sentiment': str(i % 2), 'text': f'word{i} word',
+                    'term_frequency': {f'word{i}': 1, 'word': 1}}
+                   for i in range(5)]
+        dataset.append({'sentiment': '0', 'text': None,
+                        'term_frequency': None})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'processed.parquet')
+            num_rows = twitter_processor.write_parquet(
+                iter(dataset), output_file, row_group_size=4)
+            parquet_file = twitter_processor.pq.ParquetFile(output_file)
+            self.assertEqual(num_rows, 6)
+            self.assertEqual(parquet_file.num_row_groups, 2)
+
+            batches = list(twitter_processor.iter_parquet(output_file,
+                                                          chunk_size=4))
+            self.assertEqual(batches, [dataset[:4], dataset[4:]])
+            rows = [data for batch in twitter_processor.iter_parquet(
+                        output_file, columns=['sentiment', 'text'])
+                    for data in batch]
+            self.assertEqual(rows, [{'sentiment': data['sentiment'],
+                                     'text': data['text']}
+                                    for data in dataset])
+
+    @unittest.skipIf(twitter_processor.pq is None, "pyarrow is not installed")
+    def test_write_parquet_inferred_types(self):
+        dataset = [{'text': 'spam', 'duplicate_of': None,
+                    'duplicate_count': 2, 'term_frequency': {'spam': 1}},
+                   {'text': 'spam', 'duplicate_of': 0,
+                    'duplicate_count': 1, 'term_frequency': {'spam': 1}}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'processed.parquet')
+            twitter_processor.write_parquet(dataset, output_file)
+            batches = list(twitter_processor.iter_parquet(output_file))
+            self.assertEqual(batches, [dataset])
+
+            self.assertEqual(
+                twitter_processor.write_parquet(iter([]), output_file), 0)
+            self.assertEqual(
+                list(twitter_processor.iter_parquet(output_file)), [])
+
+    def test_write_parquet_without_pyarrow(self):
+        dataset = [{'sentiment': '0', 'text': 'hello',
+                    'term_frequency': {'hello': 1}}]
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.object(twitter_processor, 'pq', None):
+            output_file = os.path.join(tmp_dir, 'processed.parquet')
+            with self.assertWarns(UserWarning):
+                twitter_processor.write_parquet(dataset, output_file)
+            self.assertEqual(os.listdir(tmp_dir), ['processed.csv.gz'])
+            with self.assertWarns(UserWarning):
+                batches = list(twitter_processor.iter_parquet(
+                    output_file, columns=['text', 'term_frequency']))
+            self.assertEqual(batches, [[{'text': 'hello',
+                                         'term_frequency': {'hello': 1}}]])
+
+    def test_encode_term_frequencies(self):
+        vocabulary = twitter_processor.Vocabulary(['world'])
+        value = twitter_processor.encode_term_frequencies(
+            {'hello': 2, 'world': 1}, 'ids', vocabulary)
+        self.assertEqual(value, '1:2 0:1')
+        self.assertEqual(twitter_processor.decode_term_frequencies(
+            value, 'ids', vocabulary), {'hello': 2, 'world': 1})
+        with self.assertRaises(ValueError):
+            twitter_processor.encode_term_frequencies({}, 'ids')
+        with self.assertRaises(ValueError):
+            twitter_processor.decode_term_frequencies('', 'json')
+
+    def test_load_data_compressed(self):
+        content = 'col1,col2\nval1,caf\u00e9\n'
+        expected_output = [{'col1': 'val1', 'col2': 'caf\u00e9'}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_file = os.path.join(tmp_dir, 'data.zip')
+            with zipfile.ZipFile(zip_file, 'w') as zip_ref:
+                zip_ref.writestr('data.csv', content.encode('utf-8'))
+            gzip_file = os.path.join(tmp_dir, 'data.csv.gz')
+            with gzip.open(gzip_file, 'wt', encoding='utf-8') as file:
+                file.write(content)
+            for file in (zip_file, gzip_file):
+                self.assertEqual(twitter_processor.load_data(file=file),
+                                 expected_output)
+                self.assertEqual(list(twitter_processor.iter_data(file=file)),
+                                 [expected_output])
+            self.assertEqual(sorted(os.listdir(tmp_dir)),
+                             ['data.csv.gz', 'data.zip'])
+
+            empty_file = os.path.join(tmp_dir, 'empty.zip')
+            with zipfile.ZipFile(empty_file, 'w') as archive:
+                archive.writestr('folder/', '')
+            with self.assertRaisesRegex(ValueError, 'empty.zip'):
+                twitter_processor.load_data(file=empty_file)
+
+    def test_load_data_compact(self):
+        content = ('sentiment,id,text\n0,1,Café Hello!!\n'
+                   '4,2,\n0,3,hello world\n0,4\n')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'data.csv')
+            with open(file, 'w', encoding='utf-8') as csv_file:
+                csv_file.write(content)
+            expected_output = twitter_processor.load_data(file=file)
+            dataset = twitter_processor.load_data(file=file, compact=True)
+        self.assertEqual(len(dataset), 4)
+        self.assertEqual(list(dataset), expected_output)
+        self.assertEqual(dataset[-1], {'sentiment': '0', 'id': '4',
+                                       'text': None})
+        self.assertEqual(dataset.columns['sentiment'].categories, ['0', '4'])
+        with self.assertRaises(IndexError):
+            dataset[4]
+
+        term_frequencies, _ = twitter_processor.process_dataset(dataset[:3])
+        twitter_processor.add_term_frequency_col(dataset[:3],
+                                                 term_frequencies)
+        self.assertEqual(dataset[0]['text'], 'caf hello')
+        self.assertEqual(dataset[0]['term_frequency'],
+                         {'caf': 1, 'hello': 1})
+        self.assertIsNone(dataset[3]['term_frequency'])
+
+        non_null = twitter_processor.eliminate_null_elements(dataset, 'text')
+        self.assertEqual([data['id'] for data in non_null], ['1', '3'])
+        self.assertEqual(non_null.to_dicts()[1]['text'], 'hello world')
+
+    def test_load_data_compact_blank_lines(self):
+        content = 'sentiment,text\n0,Hello\n\n4,World\n\n'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'data.csv')
+            with open(file, 'w', encoding='utf-8', newline='') as csv_file:
+                csv_file.write(content)
+            expected_output = twitter_processor.load_data(file=file)
+            dataset = twitter_processor.load_data(file=file, compact=True)
+        self.assertEqual(list(dataset), expected_output)
+
+        twitter_processor.preprocess_text(dataset)
+        self.assertIsInstance(dataset.columns['text'],
+                              twitter_processor.PackedColumn)
+        self.assertEqual(list(dataset.columns['text']), ['hello', 'world'])
+
+    def test_packed_column(self):
+        column = twitter_processor.PackedColumn()
+        for value in ('ab', None, 'caf\u00e9'):
+            column.append(value)
+        self.assertEqual(column[-1], 'caf\u00e9')
+        self.assertIsNone(column[-2])
+        self.assertEqual(column[::2], ['ab', 'caf\u00e9'])
+        self.assertEqual(column[1:], [None, 'caf\u00e9'])
+        for index in (3, -4):
+            with self.assertRaises(IndexError):
+                column[index]
+
+        categories = twitter_processor.CategoricalColumn()
+        for value in ('4', '0', '4'):
+            categories.append(value)
+        self.assertEqual(categories[-1], '4')
+        self.assertEqual(categories[1:], ['0', '4'])
+
     def test_print_data(self):
         dataset = [{'col1': 'val1', 'col2': 'val2', 'col3': 'val3'}]
         expected_output = "{'col1': 'val1', 'col2': 'val2', 'col3': 'val3'}\n"
@@ -27,6 +286,21 @@ class TestTwitterProcessor(TestCase):
         twitter_processor.preprocess_text(dataset)
         self.assertEqual(dataset, expected_output)
 
+    def test_normalize_text_equivalence(self):
+        texts = ['Hello, www.example.com @username #hashtag',
+                 'me myself love this python programming',
+                 'this is a test tweet', '']
+        pieces = ['http', 'www', '://', 'a', 'Z', '0', '9', '_', ' ', '\t',
+                  '\n', '@', ';', ':', "'", '.', '#', '!', '\u00e9',
+                  '\U0001f600', '\x1c']
+        rng = random.Random(0)
+        texts += [''.join(rng.choice(pieces)
+                          for _ in range(rng.randint(0, 15)))
+                  for _ in range(5000)]
+        for text in texts:
+            self.assertEqual(twitter_processor.normalize_text(text),
+                             reference_preprocess(text), repr(text))
+
     def test_remove_stopwords(self):
         dataset = [{'text': 'me myself love this python programming'},
                    {'text': 'am is are this example because '
@@ -36,6 +310,29 @@ class TestTwitterProcessor(TestCase):
         twitter_processor.remove_stopwords(dataset)
         self.assertEqual(dataset, expected_output)
 
+    def test_remove_stopwords_custom(self):
+        dataset = [{'text': 'Python is GREAT'}]
+        twitter_processor.remove_stopwords(dataset,
+                                           stopwords={'python', 'great'})
+        self.assertEqual(dataset, [{'text': 'is'}])
+
+    def test_load_stopwords(self):
+        self.assertIs(twitter_processor.load_stopwords(),
+                      twitter_processor.STOPWORDS)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stopwords_file = os.path.join(tmp_dir, 'stopwords.txt')
+            with open(stopwords_file, 'w', encoding='utf-8') as file:
+                file.write('Love\npython\n\n')
+            stopwords = twitter_processor.load_stopwords(stopwords_file)
+            self.assertEqual(stopwords, frozenset({'love', 'python'}))
+            # Loaded only once
+            self.assertIs(twitter_processor.load_stopwords(stopwords_file),
+                          stopwords)
+            dataset = [{'text': 'love this python programming'}]
+            twitter_processor.remove_stopwords(dataset,
+                                               stopwords=stopwords_file)
+            self.assertEqual(dataset, [{'text': 'this programming'}])
+
     def test_get_term_frequencies(self):
         dataset = [{'text': 'this is a test tweet'},
                    {'text': 'another example tweet'},
@@ -46,6 +343,308 @@ class TestTwitterProcessor(TestCase):
         term_frequencies = twitter_processor.get_term_frequencies(dataset)
         self.assertEqual(term_frequencies, expected_output)
 
+    def test_process_dataset(self):
+        dataset = [{'text': 'Hello, www.example.com @username #hashtag'},
+                   {'text': 'me myself love this python programming'},
+                   {'text': 'love the python tweet'}]
+        expected_dataset = [{'text': 'hello hashtag'},
+                            {'text': 'love python programming'},
+                            {'text': 'love python tweet'}]
+        expected_output = [{'hello': 1, 'hashtag': 1},
+                           {'love': 1, 'python': 1, 'programming': 1},
+                           {'love': 1, 'python': 1, 'tweet': 1}]
+        expected_vocabulary = ['hello', 'hashtag', 'love', 'python',
+                               'programming', 'tweet']
+        term_frequencies, vocabulary = twitter_processor.process_dataset(
+                                       dataset)
+        self.assertEqual(dataset, expected_dataset)
+        self.assertEqual(term_frequencies, expected_output)
+        self.assertEqual(sorted(vocabulary), sorted(expected_vocabulary))
+
+    def test_process_dataset_outputs_off(self):
+        dataset = [{'text': 'Love this Python'}]
+        term_frequencies, vocabulary = twitter_processor.process_dataset(
+                                       dataset, clean_text=False,
+                                       vocabulary=False)
+        self.assertEqual(dataset, [{'text': 'Love this Python'}])
+        self.assertEqual(term_frequencies, [{'love': 1, 'python': 1}])
+        self.assertIsNone(vocabulary)
+
+    def test_process_in_parallel(self):
+        texts = ['Hello, www.example.com @username #hashtag',
+                 'me myself love this python programming', '',
+                 'this is a test tweet', 'another example tweet'] * 3
+        dataset = [{'text': text, 'sentiment': '0'} for text in texts]
+        compact = twitter_processor.ColumnarDataset.from_rows(dataset)
+        expected_dataset = [dict(data) for data in dataset]
+        twitter_processor.preprocess_text(expected_dataset)
+        twitter_processor.remove_stopwords(expected_dataset)
+        expected_output = twitter_processor.get_term_frequencies(
+                          expected_dataset)
+        term_frequencies = twitter_processor.process_in_parallel(
+                           dataset, workers=2, batch_size=4)
+        self.assertEqual(dataset, expected_dataset)
+        self.assertEqual(term_frequencies, expected_output)
+
+        # The text column of a compact dataset is packed again
+        twitter_processor.process_in_parallel(compact, workers=1)
+        self.assertIsInstance(compact.columns['text'],
+                              twitter_processor.PackedColumn)
+        self.assertEqual(list(compact), expected_dataset)
+
+    def test_cleaning_cache(self):
+        texts = ['Hello World!! www.example.com', 'hello again',
+                 'Hello World!! www.example.com', 'third text', 'hello again']
+        dataset = [{'text': text} for text in texts]
+        expected_dataset = [dict(data) for data in dataset]
+        expected_output = twitter_processor.process_dataset(expected_dataset)
+        cache = twitter_processor.CleaningCache(max_size=2)
+        output = twitter_processor.process_dataset(dataset, cache=cache)
+        self.assertEqual(dataset, expected_dataset)
+        self.assertEqual(output, expected_output)
+        # 'hello again' was evicted by 'third text' after the first text was
+        # used again
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 4,
+                                         'evictions': 2, 'hit_rate': 0.2,
+                                         'size': 2, 'max_size': 2})
+        self.assertEqual(cache.clean('third text'), ('third', 'text'))
+        with self.assertRaises(ValueError):
+            twitter_processor.process_dataset(dataset, stopwords={'hello'},
+                                              cache=cache)
+
+        cache = twitter_processor.CleaningCache()
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(cache.clean, texts * 100))
+        self.assertEqual(results[:5], [('hello', 'world'), ('hello',),
+                                       ('hello', 'world'), ('third', 'text'),
+                                       ('hello',)])
+        self.assertEqual(cache.hits + cache.misses, 500)
+        self.assertEqual(len(cache), 3)
+
+    def test_process_in_parallel_cache(self):
+        texts = ['Hello, www.example.com @username #hashtag',
+                 'this is a test tweet'] * 5
+        dataset = [{'text': text} for text in texts]
+        expected_dataset = [dict(data) for data in dataset]
+        expected_output, _ = twitter_processor.process_dataset(
+            expected_dataset, vocabulary=False)
+        cache = twitter_processor.CleaningCache(max_size=10)
+        term_frequencies = twitter_processor.process_in_parallel(
+                           dataset, workers=1, batch_size=4, cache=cache)
+        self.assertEqual(dataset, expected_dataset)
+        self.assertEqual(term_frequencies, expected_output)
+        self.assertEqual((cache.hits, cache.misses), (8, 2))
+
+    def test_tfidf(self):
+        dataset = [{'text': 'good good day'}, {'text': 'bad day'},
+                   {'text': ''}]
+        matrix = twitter_processor.get_term_matrix(dataset)
+        weights, idf = twitter_processor.tfidf(matrix, norm=None)
+        numpy.testing.assert_allclose(
+            idf, [numpy.log(4 / 2) + 1, numpy.log(4 / 3) + 1,
+                  numpy.log(4 / 2) + 1])
+        self.assertEqual(weights.row(0), {'good': 2 * idf[0],
+                                          'day': idf[1]})
+        self.assertEqual(weights.row(2), {})
+
+        weights, _ = twitter_processor.tfidf(matrix)
+        self.assertAlmostEqual(sum(value ** 2 for value in
+                                   weights.row(1).values()), 1.0)
+        weights, _ = twitter_processor.tfidf(matrix, norm='l1',
+                                             sublinear_tf=True)
+        self.assertAlmostEqual(sum(weights.row(0).values()), 1.0)
+
+    def test_discriminative_terms(self):
+        dataset = [{'text': 'love happy day', 'sentiment': '4'},
+                   {'text': 'love sunny day', 'sentiment': '4'},
+                   {'text': 'hate rainy day', 'sentiment': '0'},
+                   {'text': 'hate day hate', 'sentiment': '0'}]
+        matrix = twitter_processor.get_term_matrix(dataset)
+        clusters, counts = twitter_processor.cluster_term_counts(
+            matrix, [data['sentiment'] for data in dataset])
+        self.assertEqual(clusters, ['4', '0'])
+        vocabulary = matrix.vocabulary
+        self.assertEqual(counts[1, vocabulary['hate']], 3)
+        self.assertEqual(counts[0, vocabulary['day']], 2)
+
+        term_frequencies = twitter_processor.get_cluster_term_frequencies(
+            dataset)
+        other_clusters, other_vocabulary, other_counts = \
+            twitter_processor.term_frequencies_to_counts(term_frequencies)
+        for cluster, words in term_frequencies.items():
+            for word, count in words.items():
+                self.assertEqual(other_counts[
+                    other_clusters.index(cluster), other_vocabulary[word]],
+                    count)
+
+        for scores in (twitter_processor.weighted_log_odds(counts),
+                       twitter_processor.chi_squared(counts)):
+            top = twitter_processor.top_scored_terms(scores, vocabulary,
+                                                     clusters, count=2)
+            self.assertEqual(top['4'][0][0], 'love')
+            self.assertEqual(top['0'][0][0], 'hate')
+            # 'day' is as frequent in both clusters
+            self.assertLess(scores[0, vocabulary['day']],
+                            scores[0, vocabulary['love']])
+            self.assertLess(scores[1, vocabulary['love']], 0)
+
+    def test_naive_bayes_classifier(self):
+        dataset = [{'text': 'love happy day', 'sentiment': '4'},
+                   {'text': 'love sunny day', 'sentiment': '4'},
+                   {'text': 'hate rainy day', 'sentiment': '0'},
+                   {'text': 'hate day hate', 'sentiment': '0'},
+                   {'text': 'happy happy', 'sentiment': '4'}]
+        tweets = [{'text': 'love day'}, {'text': 'hate unknown words'},
+                  {'text': ''}]
+
+        classifier = twitter_processor.NaiveBayesClassifier()
+        with self.assertRaises(ValueError):
+            classifier.predict(tweets)
+        classifier.partial_fit(dataset[:2]).partial_fit(dataset[2:])
+        self.assertEqual(classifier.classes, ['4', '0'])
+        self.assertEqual(classifier.doc_counts.tolist(), [3, 2])
+        self.assertEqual(classifier.predict(tweets), ['4', '0', '4'])
+        probabilities = classifier.predict_proba(tweets)
+        numpy.testing.assert_allclose(probabilities.sum(axis=1), 1)
+        # An empty tweet only has the prior probabilities
+        numpy.testing.assert_allclose(probabilities[2], [3 / 5, 2 / 5])
+
+        # Training from the counts of each cluster gives the same model
+        other = twitter_processor.NaiveBayesClassifier.from_term_frequencies(
+            twitter_processor.get_cluster_term_frequencies(dataset),
+            doc_counts={'4': 3, '0': 2})
+        self.assertEqual(other.classes, classifier.classes)
+        numpy.testing.assert_allclose(
+            other.joint_log_likelihood(tweets),
+            classifier.joint_log_likelihood(tweets))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'model.npz')
+            classifier.save(file)
+            loaded = twitter_processor.NaiveBayesClassifier.load(file)
+            self.assertEqual(os.listdir(tmp_dir), ['model.npz'])
+        numpy.testing.assert_allclose(loaded.predict_proba(tweets),
+                                      probabilities)
+        loaded.partial_fit([{'text': 'unknown', 'sentiment': '2'}])
+        self.assertEqual(loaded.predict([{'text': 'unknown'}]), ['2'])
+
+    def test_naive_bayes_classifier_aggregator(self):
+        dataset = [{'text': 'love happy day', 'sentiment': '4'},
+                   {'text': 'hate rainy day', 'sentiment': '0'}]
+        aggregator = twitter_processor.TermFrequencyAggregator()
+        classifier = twitter_processor.NaiveBayesClassifier \
+            .from_term_frequencies(aggregator.update(dataset))
+        self.assertEqual(classifier.predict([{'text': 'hate it'}]), ['0'])
+        numpy.testing.assert_allclose(
+            classifier.predict_proba([{'text': ''}]), [[0.5, 0.5]])
+
+        # Tweet counts for some classes only cannot give a prior
+        classifier.partial_fit([{'text': 'sunny', 'sentiment': '4'}])
+        with self.assertRaises(ValueError):
+            classifier.predict([{'text': 'sunny'}])
+
+    def test_deduplicate(self):
+        words = 'spam campaign buy cheap followers now limited offer today'
+        texts = [words, 'a completely different tweet about the weather',
+                 words.replace('today', 'tomorrow'), '',
+                 words.replace('now', 'fast'), '']
+        dataset = [{'text': text} for text in texts]
+
+        unique = twitter_processor.deduplicate(
+            [dict(data) for data in dataset], threshold=0.7)
+        # Empty texts are never near-duplicates
+        self.assertEqual([data['text'] for data in unique],
+                         texts[:2] + ['', ''])
+
+        collapsed = twitter_processor.deduplicate(
+            [dict(data) for data in dataset], mode='collapse', threshold=0.7)
+        self.assertEqual([data['duplicate_count'] for data in collapsed],
+                         [3, 1, 1, 1])
+
+        flagged = twitter_processor.deduplicate(dataset, mode='flag',
+                                                threshold=0.7)
+        self.assertIs(flagged, dataset)
+        self.assertEqual([data['duplicate_of'] for data in dataset],
+                         [None, None, 0, None, 0, None])
+
+        compact = twitter_processor.ColumnarDataset.from_rows(
+            {'text': text} for text in texts)
+        unique = twitter_processor.deduplicate(compact, threshold=0.7)
+        self.assertEqual(unique.to_dicts(), [{'text': text}
+                                             for text in texts[:2] + ['', '']])
+        with self.assertRaises(ValueError):
+            twitter_processor.deduplicate(dataset, mode='merge')
+
+    def test_minhash_signatures(self):
+        dataset = [{'text': 'a b c d'}, {'text': 'd c b a a'},
+                   {'text': 'a b c e'}, {'text': ''}]
+        matrix = twitter_processor.get_term_matrix(dataset)
+        signatures = twitter_processor.minhash_signatures(matrix,
+                                                          chunk_size=3)
+        self.assertEqual(signatures.shape, (4, 128))
+        numpy.testing.assert_array_equal(signatures[0], signatures[1])
+        similarity = (signatures[0] == signatures[2]).mean()
+        self.assertAlmostEqual(similarity, 3 / 5, delta=0.15)
+        self.assertTrue((signatures[3] == 2 ** 32 - 1).all())
+
+        # The signatures do not depend on the IDs of the words
+        other = twitter_processor.get_term_matrix(dataset[::-1])
+        numpy.testing.assert_array_equal(
+            twitter_processor.minhash_signatures(other)[::-1], signatures)
+
+    def test_get_term_matrix(self):
+        dataset = [{'text': 'this is a test tweet'},
+                   {'text': ''},
+                   {'text': 'tweet tweet example'}]
+        matrix = twitter_processor.get_term_matrix(dataset)
+        self.assertEqual(matrix.shape, (3, 6))
+        self.assertEqual(matrix.indptr.tolist(), [0, 5, 5, 7])
+        self.assertEqual(matrix.indices.tolist(), [0, 1, 2, 3, 4, 4, 5])
+        self.assertEqual(matrix.data.tolist(), [1, 1, 1, 1, 1, 2, 1])
+        self.assertEqual(matrix.vocabulary['example'], 5)
+        self.assertEqual(matrix.row(2), {'tweet': 2, 'example': 1})
+        self.assertEqual(matrix.to_dicts(),
+                         twitter_processor.get_term_frequencies(dataset))
+
+    def test_get_term_matrix_shared_vocabulary(self):
+        vocabulary = twitter_processor.Vocabulary(['tweet'])
+        matrix = twitter_processor.get_term_matrix(
+                 [{'text': 'another tweet'}], vocabulary=vocabulary)
+        self.assertEqual(vocabulary.words, ['tweet', 'another'])
+        self.assertEqual(matrix.indices.tolist(), [1, 0])
+
+    def test_feature_hasher(self):
+        hasher = twitter_processor.FeatureHasher(num_buckets=64)
+        dataset = [{'text': 'tweet tweet example'}, {'text': ''}]
+        matrix = hasher.transform(dataset)
+        self.assertEqual(matrix.shape, (2, 64))
+        self.assertEqual(hasher.bucket('tweet'),
+                         twitter_processor.FeatureHasher(64).bucket('tweet'))
+        self.assertEqual(matrix.row(0)[hasher.bucket('tweet')], 2)
+        self.assertEqual(sum(matrix.row(0).values()), 3)
+        self.assertEqual(matrix.row(1), {})
+        with self.assertRaises(ValueError):
+            hasher.reverse_buckets()
+
+    def test_feature_hasher_cluster_counts(self):
+        hasher = twitter_processor.FeatureHasher(num_buckets=1024,
+                                                 track_terms=10)
+        counts = hasher.cluster_counts(
+            [{'text': 'good day', 'sentiment': '4'},
+             {'text': 'bad day', 'sentiment': '0'}])
+        counts = hasher.cluster_counts(
+            iter([{'text': 'good', 'sentiment': '4'},
+                  {'text': 'good', 'sentiment': '4'}]),
+            counts=counts, chunk_size=1)
+        self.assertEqual(sorted(counts), ['0', '4'])
+        self.assertEqual(int(counts['4'].sum()), 4)
+        self.assertEqual(hasher.top_buckets(counts['4'], 2),
+                         [('good', 3), ('day', 1)])
+        untracked = twitter_processor.FeatureHasher(num_buckets=1024)
+        bucket = untracked.bucket('good')
+        self.assertEqual(untracked.top_buckets(counts['4'], 1),
+                         [(f'#{bucket}', 3)])
+
     def test_get_vocabulary(self):
         dataset = [{'text': 'this is a test tweet'},
                    {'text': 'another example tweet'},
@@ -103,6 +702,324 @@ class TestTwitterProcessor(TestCase):
         dataset = twitter_processor.eliminate_null_elements(dataset)
         self.assertEqual(dataset, expected_output)
 
+    @unittest.skipUnless(hasattr(asyncio, 'start_unix_server'),
+                         "Unix sockets are not supported")
+    def test_ingest(self):
+        records = [{'sentiment': '0', 'text': 'I love the new song!!'},
+                   {'sentiment': '4', 'text': 'Hate the Rain @rainy'},
+                   {'sentiment': '4', 'text': 'rain rain go away'}]
+        feed = ''.join(json.dumps(data) + '\n' for data in records).encode()
+
+        async def send_feed(reader, writer):
+            writer.write(feed)
+            await writer.drain()
+            writer.close()
+
+        async def run(shards, socket_file):
+            unix_server = await asyncio.start_unix_server(send_feed,
+                                                          socket_file)
+            tcp_server = await asyncio.start_server(send_feed, '127.0.0.1', 0)
+            port = tcp_server.sockets[0].getsockname()[1]
+            async with unix_server, tcp_server:
+                with ThreadPoolExecutor(2) as executor:
+                    return await twitter_processor.ingest_async(
+                        shards + [f'unix://{socket_file}',
+                                  f'tcp://127.0.0.1:{port}'],
+                        workers=2, chunk_size=2, max_queued=1,
+                        executor=executor)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shards = [os.path.join(tmp_dir, name)
+                      for name in ('shard1.csv', 'shard2.csv.gz')]
+            with patch('sys.stdout', new=StringIO()):
+                twitter_processor.write_to_csv(records, shards[0])
+            with gzip.open(shards[1], 'wt', encoding='utf-8') as file:
+                file.write('sentiment,text\n0,Love LOVE love\n')
+            aggregator = asyncio.run(run(shards,
+                                         os.path.join(tmp_dir, 'feed.sock')))
+
+        self.assertEqual(aggregator.to_dict(),
+                         {'0': {'love': 6, 'new': 3, 'song': 3},
+                          '4': {'hate': 3, 'rain': 9, 'go': 3, 'away': 3}})
+
+    def test_ingest_process_pool(self):
+        records = [{'sentiment': '0', 'text': 'I love the new song!!'},
+                   {'sentiment': '4', 'text': 'Hate the Rain @rainy'}]
+        feed = ''.join(json.dumps(data) + '\n' for data in records).encode()
+
+        async def send_feed(reader, writer):
+            writer.write(feed)
+            await writer.drain()
+            writer.close()
+
+        async def run(shard, cache):
+            server = await asyncio.start_server(send_feed, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                # The default pool of spawned worker processes
+                return await twitter_processor.ingest_async(
+                    [shard, f'tcp://127.0.0.1:{port}'], workers=1,
+                    chunk_size=1, cache=cache)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shard = os.path.join(tmp_dir, 'shard.csv')
+            with patch('sys.stdout', new=StringIO()):
+                twitter_processor.write_to_csv(records, shard)
+            cache = twitter_processor.CleaningCache(10)
+            aggregator = asyncio.run(run(shard, cache))
+
+        self.assertEqual(aggregator.to_dict(),
+                         {'0': {'love': 2, 'new': 2, 'song': 2},
+                          '4': {'hate': 2, 'rain': 2}})
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    @unittest.skipUnless(has_ipv6_loopback(), "IPv6 is not available")
+    def test_ingest_ipv6_feed(self):
+        async def send_feed(reader, writer):
+            writer.write(b'{"sentiment": "4", "text": "Hello IPv6"}\n')
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(send_feed, '::1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                with ThreadPoolExecutor(1) as executor:
+                    return await twitter_processor.ingest_async(
+                        [f'tcp://[::1]:{port}'], workers=1,
+                        executor=executor)
+
+        self.assertEqual(asyncio.run(run()).to_dict(),
+                         {'4': {'hello': 1, 'ipv': 1}})
+
+    def test_get_cluster_term_frequencies(self):
+        dataset = [{'text': 'good tweet', 'sentiment': '4'},
+                   {'text': 'bad tweet', 'sentiment': '0'},
+                   {'text': 'good good day', 'sentiment': '4'}]
+        expected_output = {'4': {'good': 3, 'tweet': 1, 'day': 1},
+                           '0': {'bad': 1, 'tweet': 1}}
+        term_frequencies = twitter_processor.get_cluster_term_frequencies(
+                           dataset)
+        self.assertEqual(term_frequencies, expected_output)
+
+    def test_term_frequency_aggregator(self):
+        first = twitter_processor.TermFrequencyAggregator()
+        first.update([{'text': 'good tweet', 'sentiment': '4'}])
+        second = twitter_processor.TermFrequencyAggregator()
+        second.update([{'text': 'bad tweet', 'sentiment': '0'},
+                       {'text': 'good day', 'sentiment': '4'}])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'frequencies.json')
+            first.merge(second).save(file)
+            aggregator = twitter_processor.TermFrequencyAggregator.load(file)
+        twitter_processor.get_cluster_term_frequencies(
+            [{'text': 'bad day', 'sentiment': '0'}], aggregator=aggregator)
+        self.assertEqual(aggregator.to_dict(),
+                         {'4': {'good': 2, 'tweet': 1, 'day': 1},
+                          '0': {'bad': 2, 'tweet': 1, 'day': 1}})
+
+    def test_term_frequency_aggregator_max_terms_save(self):
+        words = 'a a a b c d e f'.split()
+        aggregator = twitter_processor.TermFrequencyAggregator(max_terms=2)
+        aggregator.update([{'text': ' '.join(words), 'sentiment': '4'}])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'frequencies.json')
+            aggregator.save(file)
+            loaded = twitter_processor.TermFrequencyAggregator.load(file)
+        self.assertEqual(loaded.max_terms, 2)
+        sketch = loaded.term_frequencies['4']
+        saved = aggregator.term_frequencies['4']
+        self.assertEqual(dict(sketch), dict(saved))
+        self.assertEqual(sketch.errors, saved.errors)
+
+        # The bounds still hold after new records are added
+        loaded.update([{'text': 'e b b', 'sentiment': '4'}])
+        words += ['e', 'b', 'b']
+        for word, count in loaded.term_frequencies['4'].items():
+            self.assertGreaterEqual(count, words.count(word))
+            self.assertLessEqual(count - sketch.errors[word],
+                                 words.count(word))
+
+    def test_load_processed_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'tweets.csv')
+            with open(file, 'w', encoding='utf-8') as output:
+                output.write('sentiment,text\n4,I love Python!\n'
+                             '0,this is a bad day\n4,\n')
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            corpus = twitter_processor.load_processed_corpus(file, cache_dir)
+            self.assertEqual(corpus.to_dataset(),
+                             [{'sentiment': '4', 'text': 'love python'},
+                              {'sentiment': '0', 'text': 'bad day'},
+                              {'sentiment': '4', 'text': ''}])
+            self.assertEqual(corpus.tokens(1).tolist(), [2, 3])
+            self.assertIsInstance(corpus.token_ids, numpy.memmap)
+
+            # The second load comes from the cache
+            with patch.object(twitter_processor, 'iter_data') as iter_data:
+                cached = twitter_processor.load_processed_corpus(file,
+                                                                 cache_dir)
+            iter_data.assert_not_called()
+            self.assertEqual(cached.to_dataset(), corpus.to_dataset())
+
+            # Other settings use another cache
+            other = twitter_processor.load_processed_corpus(
+                    file, cache_dir, stopwords={'love'})
+            self.assertEqual(other.text(0), 'i python')
+
+            # Saving over a cache built by another process keeps it, and
+            # leaves no temporary directory behind
+            directory = os.path.join(
+                cache_dir, twitter_processor.corpus_cache_key(file))
+            other.save(directory)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+            self.assertEqual(
+                twitter_processor.CorpusCache.load(directory).to_dataset(),
+                corpus.to_dataset())
+
+    def test_space_saving(self):
+        words = ['good'] * 50 + ['bad'] * 30 + [f'rare{i}' for i in range(20)]
+        random.Random(0).shuffle(words)
+        sketch = twitter_processor.SpaceSaving(5)
+        sketch.update(words)
+        self.assertEqual(len(sketch), 5)
+        self.assertEqual([word for word, _ in sketch.most_common(2)],
+                         ['good', 'bad'])
+        for word, count in sketch.items():
+            true_count = words.count(word)
+            self.assertGreaterEqual(count, true_count)
+            self.assertLessEqual(count - sketch.errors[word], true_count)
+
+    def test_space_saving_merge(self):
+        rng = random.Random(0)
+        words = [f'w{min(int(rng.paretovariate(1)), 50)}'
+                 for _ in range(2000)]
+        first = twitter_processor.SpaceSaving(8)
+        first.update(words[:1000])
+        second = twitter_processor.SpaceSaving(8)
+        second.update(words[1000:])
+        first.merge(second).merge({'w1': 2})
+        words += ['w1', 'w1']
+        self.assertEqual(len(first), 8)
+        self.assertEqual(first.most_common(1)[0][0], 'w1')
+        for word, count in first.items():
+            true_count = words.count(word)
+            self.assertGreaterEqual(count, true_count)
+            self.assertLessEqual(count - first.errors[word], true_count)
+
+        aggregator = twitter_processor.TermFrequencyAggregator(max_terms=2)
+        aggregator.update([{'text': 'a a a b c', 'sentiment': '4'}])
+        other = twitter_processor.TermFrequencyAggregator(max_terms=2)
+        other.update([{'text': 'b b d', 'sentiment': '4'}])
+        merged = aggregator.merge(other).term_frequencies['4']
+        # The true counts are a: 3 and b: 3
+        self.assertEqual(dict(merged), {'a': 4, 'b': 4})
+        self.assertEqual(merged.errors, {'a': 1, 'b': 2})
+
+    def test_get_cluster_term_frequencies_max_terms(self):
+        dataset = [{'text': 'good good good day', 'sentiment': '4'},
+                   {'text': 'good tweet', 'sentiment': '4'},
+                   {'text': 'bad bad day', 'sentiment': '0'}]
+        term_frequencies = twitter_processor.get_cluster_term_frequencies(
+                           dataset, max_terms=10)
+        self.assertEqual(dict(term_frequencies['4']),
+                         {'good': 4, 'day': 1, 'tweet': 1})
+        term_frequencies = twitter_processor.get_cluster_term_frequencies(
+                           dataset, max_terms=2)
+        self.assertEqual(term_frequencies['4'].most_common(1), [('good', 4)])
+        self.assertEqual(len(term_frequencies['4']), 2)
+
+    def test_generate_cluster_histograms_headless(self):
+        term_frequencies = {'0': {'bad': 3, 'day': 1},
+                            '4': {'good': 2, 'tweet': 1}}
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch('sys.stdout', new=StringIO()), \
+                patch.object(twitter_processor.plt, 'show') as show:
+            twitter_processor.generate_cluster_histograms(
+                term_frequencies, output_dir=tmp_dir, headless=True,
+                workers=2)
+            self.assertEqual(sorted(os.listdir(tmp_dir)),
+                             ['histogram_cluster0.png',
+                              'histogram_cluster4.png'])
+        show.assert_not_called()
+
+    def test_render_histogram_title(self):
+        twitter_processor._init_render_worker()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            twitter_processor._render_histogram(
+                ('4', [('good', 2), ('day', 1)]), tmp_dir, top_count=5)
+        axes = twitter_processor._worker_figure.axes[0]
+        self.assertEqual(axes.get_title(), 'Top 5 Words - Cluster 4')
+
+    def test_generate_word_clouds_from_frequencies(self):
+        term_frequencies = {'4': {'good': 3, 'tweet': 1, 'day': 2}}
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch('sys.stdout', new=StringIO()), \
+                patch.object(twitter_processor, 'WordCloud') as word_cloud, \
+                patch.object(twitter_processor.plt, 'imshow'), \
+                patch.object(twitter_processor.plt, 'show'):
+            twitter_processor.generate_word_clouds_from_frequencies(
+                term_frequencies, output_dir=tmp_dir, top_count=2)
+        generate = word_cloud.return_value.generate_from_frequencies
+        generate.assert_called_once_with({'good': 3, 'day': 2})
+
+    def test_generate_word_clouds_headless(self):
+        dataset = [{'text': 'good tweet', 'sentiment': '4'},
+                   {'text': 'bad day', 'sentiment': '0'}]
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch('sys.stdout', new=StringIO()), \
+                patch.object(twitter_processor.nltk, 'word_tokenize',
+                             str.split), \
+                patch.object(twitter_processor.plt, 'show') as show:
+            twitter_processor.generate_word_clouds_for_clusters(
+                dataset, output_dir=tmp_dir, headless=True, workers=2)
+            self.assertEqual(sorted(os.listdir(tmp_dir)),
+                             ['cluster_0.png', 'cluster_4.png'])
+        show.assert_not_called()
+
+    def test_instrumentation(self):
+        metrics = twitter_processor.METRICS
+        metrics.reset()
+        metrics.enable()
+        try:
+            dataset = [{'text': 'Hello @user http://t.co/x'},
+                       {'text': 'Love this Python'}]
+            twitter_processor.preprocess_text(dataset)
+            twitter_processor.process_dataset(dataset)
+            frequencies = twitter_processor.get_cluster_term_frequencies(
+                {'text': data['text'], 'sentiment': '4'}
+                for data in dataset)
+
+            @twitter_processor.instrumented
+            def clusters(term_frequencies):
+                return list(term_frequencies)
+            clusters(frequencies)
+            with patch('sys.stdout', new=StringIO()):
+                twitter_processor.print_data(dataset)
+        finally:
+            metrics.disable()
+        twitter_processor.preprocess_text(dataset)
+
+        self.assertEqual([record['stage'] for record in metrics.records],
+                         ['preprocess_text', 'process_dataset',
+                          'get_cluster_term_frequencies', 'clusters'])
+        record = metrics.records[0]
+        self.assertEqual(record['rows'], 2)
+        # Rows read from a generator are counted, clusters are not rows
+        self.assertEqual(metrics.records[2]['rows'], 2)
+        self.assertIsNone(metrics.records[3]['rows'])
+        self.assertGreaterEqual(record['peak_alloc_bytes'], 0)
+        self.assertGreater(record['rows_per_second'], 0)
+        self.assertIn('process_dataset', metrics.summary())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, 'metrics.jsonl')
+            metrics.export_jsonl(file)
+            with open(file, encoding='utf-8') as input_file:
+                lines = [json.loads(line) for line in input_file]
+        self.assertEqual(lines, metrics.records)
+        metrics.reset()
+
 
 if __name__ == '__main__':
     unittest.main()
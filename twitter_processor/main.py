@@ -1,53 +1,128 @@
+import argparse
+from collections import deque
+from itertools import chain
+
 import twitter_processor
 
+# Number of rows held in memory at any time while processing the dataset
+CHUNK_SIZE = 10000
+INPUT_FILE = 'data/twitter_reduced.zip'
+PROCESSED_FILE = 'data/twitter_processed.csv'
+
+
+def processed_rows(file=PROCESSED_FILE):
+    """
+        Stream the rows of the processed dataset, batch by batch.
+    """
+    return chain.from_iterable(twitter_processor.iter_data(file, CHUNK_SIZE))
+
+
+def non_null_rows(text_col='text'):
+    """
+        Stream the processed rows with a non-empty text column. This is the
+        streaming counterpart of `eliminate_null_elements`.
+    """
+    return (data for data in processed_rows() if data[text_col])
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true',
+                        help='save the plots without displaying them, '
+                             'rendering them in parallel')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='record the time and memory of each stage and '
+                             'append them to FILE as JSON lines')
+    parser.add_argument('--cache-size', type=int, default=0, metavar='N',
+                        help='cache the cleaned words of up to N distinct '
+                             'texts, so repeated tweets are cleaned once')
+    args = parser.parse_args()
+    if args.metrics:
+        twitter_processor.METRICS.enable()
+    cache = twitter_processor.CleaningCache(args.cache_size) \
+        if args.cache_size > 0 else None
+
     print('\nSolución de la PEC4. Se ejecutan todos los ejercicios menos '
           'el 7, que está resuelto aparte.')
 
-    print('\nEjercicio 1.1: Descomprimimos el zip y guardamos el csv en data')
-    twitter_processor.unzip_file("data/twitter_reduced.zip", "data/")
+    print('\nEjercicio 1.1: Leemos el csv directamente del zip, sin '
+          'descomprimirlo en data')
+
+    print('\nEjercicio 1.2: Cargamos el dataset por lotes con la estructura '
+          'propuesta y cargamos los 5 primeros registros:')
+
+    # The dataset is processed in batches of CHUNK_SIZE rows, so memory use
+    # does not depend on the size of the input file
+    last_rows = deque(maxlen=5)
+    first_term_frequencies = None
+    element_20 = None
+    vocabulary = set()
+    num_rows = 0
+    for i, batch in enumerate(twitter_processor.iter_data(INPUT_FILE,
+                                                          CHUNK_SIZE)):
+        if i == 0:
+            twitter_processor.print_data(batch)
+            print('\nEjercicios 2 a 4.2: Preprocesamos, eliminamos stopwords, '
+                  'calculamos frecuencias y guardamos en formato csv:')
+
+        # Preprocess, remove stopwords, get the term frequencies and the
+        # vocabulary tokenizing each tweet only once
+        term_frequencies, batch_vocabulary = \
+            twitter_processor.process_dataset(batch, cache=cache)
+        last_rows.extend(dict(data) for data in batch[-5:])
+        if first_term_frequencies is None:
+            first_term_frequencies = term_frequencies[:5]
+        vocabulary.update(batch_vocabulary)
+
+        twitter_processor.add_term_frequency_col(batch, term_frequencies)
+        if num_rows <= 19 < num_rows + len(batch):
+            element_20 = batch[19 - num_rows]
+        num_rows += len(batch)
+
+        twitter_processor.write_to_csv(batch, PROCESSED_FILE, append=i > 0)
+
+    if cache is not None:
+        print('\nAciertos de la caché de textos limpios:')
+        print(cache.stats())
 
-    print('\nEjercicio 1.2: Cargamos el dataset con la estructura propuesta '
-          ' y cargamos los 5 primeros registros:')
-    dataset = twitter_processor.load_data()
-    twitter_processor.print_data(dataset)
-    twitter_processor.preprocess_text(dataset)
-    twitter_processor.remove_stopwords(dataset)
     print('\nEjercicio 2.1 y ejercicio 2.2: Mostramos los últimos 5 registros '
           'después de realizar el preprocesado y eliminar stopwords:')
-    twitter_processor.print_data(dataset, last=True)
+    twitter_processor.print_data(list(last_rows), last=True)
 
-    term_frequencies = twitter_processor.get_term_frequencies(dataset)
     print('\nEjercicio 3: Frecuencias de términos (comprobamos que '
           'se almacenan correctamente)')
-    twitter_processor.print_data(term_frequencies)
+    twitter_processor.print_data(first_term_frequencies)
 
-    vocabulary_list = twitter_processor.get_vocabulary(dataset)
     print('\nMostramos los 10 primeros resultados del vocabulario '
           'ordenado alfabéticamente.\n')
-    twitter_processor.print_sorted_list(vocabulary_list)
+    twitter_processor.print_sorted_list(vocabulary)
 
-    twitter_processor.add_term_frequency_col(dataset, term_frequencies)
     print('\nEjercicio 4.1: Mostramos el elemento 20 del dataset:')
-    print(dataset[19])
-
-    print('\nEjercicio 4.2: Guardamos el dataset en formato csv:')
-    twitter_processor.write_to_csv(dataset)
+    print(element_20)
 
     print('\nEjercicio 5.1: Número de clusters:')
-    twitter_processor.find_num_clusters(dataset)
+    twitter_processor.find_num_clusters(processed_rows())
 
     print('\nEjercicio 5.2: Respondemos a las cuestiones:')
-    twitter_processor.find_empty_percentage(dataset)
+    twitter_processor.find_empty_percentage(processed_rows())
 
-    dataset = twitter_processor.eliminate_null_elements(dataset)
+    # Filter the null elements on the fly instead of building a new list
+    twitter_processor.find_empty_percentage(non_null_rows())
 
-    twitter_processor.find_empty_percentage(dataset)
+    # The cluster term frequencies are counted once and used for both the
+    # word clouds and the histograms
+    cluster_term_frequencies = twitter_processor.get_cluster_term_frequencies(
+                               non_null_rows())
 
     print('\nEjercicio 5.3: Generamos word cloud para cada cluster')
-    twitter_processor.generate_word_clouds_for_clusters(dataset)
+    twitter_processor.generate_word_clouds_from_frequencies(
+        cluster_term_frequencies, headless=args.headless)
 
     print('\nEjercicio 6: Generamos histogramas')
-    cluster_term_frequencies = twitter_processor.get_cluster_term_frequencies(
-                               dataset)
-    twitter_processor.generate_cluster_histograms(cluster_term_frequencies)
+    twitter_processor.generate_cluster_histograms(cluster_term_frequencies,
+                                                  headless=args.headless)
+
+    if args.metrics:
+        print('\nTiempo y memoria de cada etapa:\n')
+        print(twitter_processor.METRICS.summary())
+        twitter_processor.METRICS.export_jsonl(args.metrics)
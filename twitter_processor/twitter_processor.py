@@ -1,14 +1,259 @@
+import ast
+import asyncio
+import bz2
 import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import lzma
+import multiprocessing
+import shutil
+import tempfile
+import time
+import threading
+import tracemalloc
+import warnings
 import zipfile
+import zlib
 import re
+from contextlib import contextmanager
+from array import array
 from collections import defaultdict
 import nltk
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import os
-from collections import Counter
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping, MutableMapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial, wraps
+from itertools import chain, islice
+from operator import itemgetter
+from urllib.parse import urlsplit
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Parquet support is optional (see `write_parquet`)
+    pa = pq = None
+
+
+class PipelineMetrics:
+    """
+        Opt-in collector of the wall time, CPU time, rows processed and peak
+        memory allocations of each stage of the pipeline.
+
+        The public functions of this module are wrapped with `instrumented`
+        and record one entry per call while the collector is enabled. The
+        per-text helpers, the generators and the functions that only print a
+        few rows, such as `print_data`, are not instrumented.
+
+        Attributes:
+            enabled (bool): Whether calls are being recorded.
+            trace_memory (bool): Whether peak allocations are measured with
+                                 `tracemalloc`.
+            records (list): One dictionary of measures per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = True
+        self.records = []
+        # Measures of the stages in progress, innermost last
+        self._stack = []
+        self._started_tracing = False
+
+    def enable(self, trace_memory=True):
+        """
+            Start recording the calls to the instrumented stages.
+
+            Args:
+                trace_memory (bool): Whether to measure peak allocations with
+                                     `tracemalloc`, which slows the stages
+                                     down.
+        """
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def disable(self):
+        """
+            Stop recording calls. The records collected are kept.
+        """
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        """
+            Remove the records collected.
+        """
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+            Measure a block of code as a stage of the pipeline.
+
+            Args:
+                name (str): The name of the stage.
+                rows (int): Number of rows processed, if known.
+
+            Yields:
+                dict: The measures in progress. The number of rows can be set
+                      in its 'rows' key when it is only known at the end.
+        """
+        frame = {'peak': 0, 'base': 0, 'rows': rows}
+        if not self.enabled:
+            yield frame
+            return
+
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the peak of the enclosing stage before resetting it
+            if self._stack:
+                parent = self._stack[-1]
+                parent['peak'] = max(parent['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['peak'] = frame['base'] = current
+        self._stack.append(frame)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield frame
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            self._stack.pop()
+            if self.trace_memory:
+                frame['peak'] = max(frame['peak'],
+                                    tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['peak'] = max(parent['peak'], frame['peak'])
+
+            rows = frame['rows']
+            self.records.append({
+                'stage': name,
+                'wall_seconds': wall_seconds,
+                'cpu_seconds': cpu_seconds,
+                'rows': rows,
+                'rows_per_second': (rows / wall_seconds
+                                    if rows is not None and wall_seconds
+                                    else None),
+                'peak_alloc_bytes': (frame['peak'] - frame['base']
+                                     if self.trace_memory else None),
+            })
+
+    def summary(self):
+        """
+            Aggregate the records by stage.
+
+            Returns:
+                str: A table with the calls, total wall and CPU time, rows,
+                     rows per second and largest peak allocation of each
+                     stage.
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {
+                'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'rows': None, 'peak_alloc_bytes': 0})
+            total['calls'] += 1
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            if record['rows'] is not None:
+                total['rows'] = (total['rows'] or 0) + record['rows']
+            total['peak_alloc_bytes'] = max(total['peak_alloc_bytes'],
+                                            record['peak_alloc_bytes'] or 0)
+
+        lines = [f"{'stage':<38} {'calls':>6} {'wall (s)':>10} "
+                 f"{'cpu (s)':>10} {'rows':>12} {'rows/s':>12} "
+                 f"{'peak (MB)':>10}"]
+        for name, total in totals.items():
+            if total['rows'] is None:
+                # Stages that do not process rows, e.g. the plots
+                rows = rows_per_second = '-'
+            else:
+                seconds = total['wall_seconds']
+                rows = f"{total['rows']:,}"
+                rows_per_second = \
+                    f"{total['rows'] / seconds if seconds else 0:,.0f}"
+            lines.append(f"{name:<38} {total['calls']:>6} "
+                         f"{total['wall_seconds']:>10.3f} "
+                         f"{total['cpu_seconds']:>10.3f} "
+                         f"{rows:>12} {rows_per_second:>12} "
+                         f"{total['peak_alloc_bytes'] / 2 ** 20:>10.1f}")
+        return '\n'.join(lines)
+
+    def export_jsonl(self, file):
+        """
+            Append the records to a JSON lines file, one record per line.
+
+            Args:
+                file (str): Path to the output file.
+        """
+        with open(file, 'a', encoding='utf-8') as output:
+            for record in self.records:
+                output.write(json.dumps(record) + '\n')
 
 
+# Collector used by the instrumented functions of this module
+METRICS = PipelineMetrics()
+
+
+def _counted(iterator, counter):
+    """
+        Yield the items of an iterator, counting them in `counter[0]`.
+    """
+    for item in iterator:
+        counter[0] += 1
+        yield item
+
+
+def instrumented(function):
+    """
+        Record the calls to a pipeline stage in `METRICS` while it is
+        enabled. The rows processed are the length of the first argument,
+        the number of items read from it if it is an iterator, or else the
+        length of the list returned. They are unknown (None) when the first
+        argument is a mapping, e.g. the term frequencies of each cluster.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not METRICS.enabled:
+            return function(*args, **kwargs)
+
+        first = args[0] if args else None
+        rows = counter = None
+        # The term frequencies of each cluster, for example, are not rows
+        count_rows = not isinstance(first, Mapping)
+        if count_rows and hasattr(first, '__len__') and \
+                not isinstance(first, str):
+            rows = len(first)
+        elif count_rows and hasattr(first, '__next__'):
+            counter = [0]
+            args = (_counted(first, counter),) + args[1:]
+        with METRICS.stage(function.__name__, rows) as measures:
+            result = function(*args, **kwargs)
+            if counter is not None:
+                measures['rows'] = counter[0]
+            elif rows is None and count_rows and isinstance(result, list):
+                measures['rows'] = len(result)
+        return result
+
+    return wrapper
+
+
+@instrumented
 def unzip_file(zip_filepath, extract_path):
     """
         Unzip a file and save it to the specified directory.
@@ -28,19 +273,343 @@ def unzip_file(zip_filepath, extract_path):
               os.path.join(extract_path, 'twitter_reduced.csv'))
 
 
-def load_data(file="data/twitter_reduced.csv"):
+# Openers of the compressed CSV formats, by file extension
+COMPRESSED_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+@contextmanager
+def open_csv(file):
+    """
+        Open a CSV file for reading as text. ZIP archives and gzip, bz2 and
+        xz compressed files are decompressed on the fly, without writing an
+        intermediate file. For a ZIP archive, its first file is read.
+
+        Args:
+            file (str): Path to the CSV file or archive.
+
+        Yields:
+            file object: The CSV file opened in text mode.
+
+        Raises:
+            ValueError: If the ZIP archive has no file.
+    """
+    extension = os.path.splitext(file)[1].lower()
+
+    if extension == '.zip':
+        with zipfile.ZipFile(file, 'r') as zip_ref:
+            member = next((name for name in zip_ref.namelist()
+                           if not name.endswith('/')), None)
+            if member is None:
+                raise ValueError(f"The ZIP archive {file} has no file")
+            with zip_ref.open(member) as binary_file:
+                yield io.TextIOWrapper(binary_file, encoding='utf-8')
+    elif extension in COMPRESSED_OPENERS:
+        with COMPRESSED_OPENERS[extension](file, 'rt',
+                                           encoding='utf-8') as text_file:
+            yield text_file
+    else:
+        with open(file, 'r', encoding='utf-8') as text_file:
+            yield text_file
+
+
+class PackedColumn(Sequence):
+    """
+        Read-only column of strings stored as a single UTF-8 buffer with the
+        offset of each value, instead of one string object per value.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+        # Indices of the missing (None) values
+        self.missing = set()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("column index out of range")
+        if i in self.missing:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def __iter__(self):
+        data, offsets, missing = self.data, self.offsets, self.missing
+        for i in range(len(self)):
+            if i in missing:
+                yield None
+            else:
+                yield data[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    def append(self, value):
+        """
+            Add a value at the end of the column.
+
+            Args:
+                value (str): The value, or None if it is missing.
+        """
+        if value is None:
+            self.missing.add(len(self))
+        else:
+            self.data += value.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+
+class CategoricalColumn(Sequence):
+    """
+        Read-only column of a few distinct values, e.g. the sentiment labels,
+        stored as integer codes into a list of the distinct values. Each
+        distinct value is stored only once.
+    """
+
+    def __init__(self):
+        self.codes = array('I')
+        self.categories = []
+        self._category_codes = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            categories = self.categories
+            return [categories[code] for code in self.codes[i]]
+        return self.categories[self.codes[i]]
+
+    def __iter__(self):
+        categories = self.categories
+        for code in self.codes:
+            yield categories[code]
+
+    def append(self, value):
+        """
+            Add a value at the end of the column.
+
+            Args:
+                value (str): The value.
+        """
+        code = self._category_codes.get(value)
+        if code is None:
+            code = self._category_codes[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+
+class Row(MutableMapping):
+    """
+        View of one row of a `ColumnarDataset`. It behaves as the dictionary
+        of the row, and reads and writes go to the dataset columns.
+    """
+
+    __slots__ = ('_dataset', '_index')
+
+    def __init__(self, dataset, index):
+        self._dataset = dataset
+        self._index = index
+
+    def __getitem__(self, col):
+        return self._dataset.columns[col][self._index]
+
+    def __setitem__(self, col, value):
+        columns = self._dataset.columns
+        if col not in columns:
+            columns[col] = [None] * len(self._dataset)
+        elif not isinstance(columns[col], list):
+            # Packed columns are read-only, so the column is unpacked on the
+            # first write, e.g. when `preprocess_text` replaces the text
+            columns[col] = list(columns[col])
+        columns[col][self._index] = value
+
+    def __delitem__(self, col):
+        raise TypeError("columns cannot be deleted from a single row")
+
+    def __iter__(self):
+        return iter(self._dataset.columns)
+
+    def __len__(self):
+        return len(self._dataset.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ColumnarDataset(Sequence):
+    """
+        Compact dataset that stores each column separately instead of one
+        dictionary per row. String columns are packed in a single buffer
+        (`PackedColumn`) and the columns with few distinct values, such as
+        the sentiment labels, are stored as integer codes
+        (`CategoricalColumn`). A column becomes a plain list when it is
+        written to, and `pack` packs it again; `preprocess_text`,
+        `remove_stopwords` and `process_dataset` do so with the text column.
+
+        `dataset[i]` returns a `Row` view, so the functions of this module
+        can use it in place of a list of dictionaries, e.g. reading and
+        writing `dataset[i][col]` or adding a column with
+        `add_term_frequency_col`.
+
+        Attributes:
+            columns (dict): The values of each column.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = columns if columns is not None else {}
+
+    def __len__(self):
+        for values in self.columns.values():
+            return len(values)
+        return 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Row(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("dataset index out of range")
+        return Row(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Row(self, i)
+
+    @staticmethod
+    def _new_columns(names, categorical_cols):
+        return {col: (CategoricalColumn() if col in categorical_cols
+                      else PackedColumn())
+                for col in names}
+
+    @classmethod
+    def from_csv(cls, file, categorical_cols=('sentiment', 'query')):
+        """
+            Load a CSV file without building a dictionary per row.
+
+            Args:
+                file (file object): The CSV file opened in text mode.
+                categorical_cols (tuple): The columns with few distinct
+                                          values, stored as integer codes.
+
+            Returns:
+                ColumnarDataset: The dataset.
+        """
+        reader = csv.reader(file)
+        header = next(reader, [])
+        columns = cls._new_columns(header, categorical_cols)
+        appends = [column.append for column in columns.values()]
+        missing = [None] * len(header)
+        for row in reader:
+            # Blank lines are skipped and missing fields are None, as with
+            # csv.DictReader. Extra fields are dropped, whereas
+            # csv.DictReader keeps them in a list under the None key
+            if not row:
+                continue
+            if len(row) < len(header):
+                row = row + missing[len(row):]
+            for append, value in zip(appends, row):
+                append(value)
+        return cls(columns)
+
+    @classmethod
+    def from_rows(cls, rows, categorical_cols=('sentiment', 'query')):
+        """
+            Build a dataset from dictionaries with the same string values.
+
+            Args:
+                rows (iterable): The rows of the dataset.
+                categorical_cols (tuple): The columns with few distinct
+                                          values, stored as integer codes.
+
+            Returns:
+                ColumnarDataset: The dataset.
+        """
+        columns = {}
+        for i, row in enumerate(rows):
+            if i == 0:
+                columns = cls._new_columns(row, categorical_cols)
+            for col, column in columns.items():
+                column.append(row[col])
+        return cls(columns)
+
+    def select(self, indices):
+        """
+            Build a new dataset with some of the rows.
+
+            Args:
+                indices (iterable): The indices of the rows, in order.
+
+            Returns:
+                ColumnarDataset: The dataset with the selected rows.
+        """
+        indices = list(indices)
+        columns = {}
+        for col, values in self.columns.items():
+            if isinstance(values, list):
+                columns[col] = [values[i] for i in indices]
+            else:
+                columns[col] = type(values)()
+                for i in indices:
+                    columns[col].append(values[i])
+        return ColumnarDataset(columns)
+
+    def pack(self, *cols):
+        """
+            Pack again the string columns that became plain lists when they
+            were written to, so they take less memory.
+
+            Args:
+                *cols (str): The columns to pack. Defaults to all of them.
+                             Columns with values other than strings or None
+                             are left as lists.
+        """
+        for col in cols or list(self.columns):
+            values = self.columns[col]
+            if not isinstance(values, list) or not all(
+                    value is None or isinstance(value, str)
+                    for value in values):
+                continue
+            column = PackedColumn()
+            for value in values:
+                column.append(value)
+            self.columns[col] = column
+
+    def to_dicts(self):
+        """
+            Returns:
+                list: The rows of the dataset as a list of dictionaries.
+        """
+        names = list(self.columns)
+        return [dict(zip(names, values))
+                for values in zip(*self.columns.values())]
+
+
+@instrumented
+def load_data(file="data/twitter_reduced.csv", compact=False):
     """
         Load data from a CSV file.
 
         Args:
-            file (str): Path to the CSV file.
+            file (str): Path to the CSV file. It can also be a ZIP archive or
+                        a gzip, bz2 or xz compressed file (see `open_csv`).
+            compact (bool): Whether to load the data in a `ColumnarDataset`,
+                            which takes several times less memory, instead
+                            of a list of dictionaries.
 
         Returns:
-            list: A list of dictionaries representing the dataset.
+            list: A list of dictionaries representing the dataset, or a
+                  `ColumnarDataset` if `compact` is True.
     """
+    if compact:
+        with open_csv(file) as file:
+            return ColumnarDataset.from_csv(file)
+
     dataset = []  # List to store dictionaries
 
-    with open(file, 'r', encoding='utf-8') as file:
+    with open_csv(file) as file:
         reader = csv.DictReader(file)
         for row in reader:
             dataset.append(row)
@@ -48,6 +617,38 @@ def load_data(file="data/twitter_reduced.csv"):
     return dataset
 
 
+def iter_data(file="data/twitter_reduced.csv", chunk_size=10000):
+    """
+        Load data from a CSV file lazily, in bounded batches of rows.
+
+        Only one batch is held in memory at a time, so the per-row stages
+        (`preprocess_text`, `remove_stopwords`, `get_term_frequencies`,
+        `get_vocabulary`, `write_to_csv`) can be applied batch by batch to
+        files that do not fit in memory.
+
+        Args:
+            file (str): Path to the CSV file. It can also be a ZIP archive or
+                        a gzip, bz2 or xz compressed file (see `open_csv`).
+            chunk_size (int): Maximum number of rows per batch.
+
+        Yields:
+            list: A list of at most `chunk_size` dictionaries.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    with open_csv(file) as file:
+        reader = csv.DictReader(file)
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
 def print_data(dataset, num_rows=5, last=False):
     """
         Print the data from the dataset.
@@ -67,6 +668,51 @@ def print_data(dataset, num_rows=5, last=False):
             break
 
 
+# URLs and runs of non-ASCII characters, removed in the same scan
+URL_NON_ASCII_PATTERN = re.compile(r'http\S+|www\S+|[^\x00-\x7F]+')
+
+# Words that start with a symbol. Matched after non-ASCII removal, which
+# can join a symbol to a word (e.g. '@\u00e9word' -> '@word')
+SYMBOL_WORD_PATTERN = re.compile(r'[@;:\']\b\S+\b')
+
+# On ASCII-only text the non-ASCII removal is a no-op, so URLs and words
+# starting with a symbol can be removed in a single scan
+URL_SYMBOL_WORD_PATTERN = re.compile(r'http\S+|www\S+|[@;:\']\b\S+\b')
+
+# Keeps letters (lowercased) and whitespace and drops every other ASCII
+# character, which removes symbols and numbers in one pass
+ASCII_NORMALIZE_TABLE = {
+    code: (chr(code).lower() if chr(code).isalpha() or chr(code).isspace()
+           else None)
+    for code in range(128)
+}
+
+
+def normalize_text(text):
+    """
+        Normalize a single tweet: eliminate URLs, non-ASCII characters, words
+        starting with a symbol, symbols and numbers, and convert the text to
+        lowercase and trim it.
+
+        The output is identical to applying those steps one after another,
+        but it needs at most two regex scans and a `str.translate` call.
+
+        Args:
+            text (str): The text to normalize.
+
+        Returns:
+            str: The normalized text.
+    """
+    if text.isascii():
+        text = URL_SYMBOL_WORD_PATTERN.sub('', text)
+    else:
+        text = URL_NON_ASCII_PATTERN.sub('', text)
+        text = SYMBOL_WORD_PATTERN.sub('', text)
+
+    return text.translate(ASCII_NORMALIZE_TABLE).strip()
+
+
+@instrumented
 def preprocess_text(dataset, text_col='text'):
     """
        Preprocess the text data in the dataset.
@@ -76,60 +722,104 @@ def preprocess_text(dataset, text_col='text'):
            text_col (str): The name of the column containing the text data.
     """
     for data in dataset:
-        # Eliminate URLs
-        data[text_col] = re.sub(r'http\S+|www\S+', '', data[text_col])
+        data[text_col] = normalize_text(data[text_col])
+    if isinstance(dataset, ColumnarDataset):
+        dataset.pack(text_col)
+
+
+STOPWORDS = frozenset(['i', 'me', 'my', 'myself', 'we', 'our', 'ours',
+                       'ourselves', 'you', 'your', 'yours', 'yourself',
+                       'yourselves', 'he', 'him', 'his', 'himself', 'she',
+                       'her', 'hers', 'herself', 'it', 'its', 'itself', 'they',
+                       'them', 'their', 'theirs', 'themselves', 'what',
+                       'which', 'who', 'whom', 'this', 'that', 'these',
+                       'those', 'am', 'is', 'are', 'was', 'were', 'be', 'been',
+                       'being', 'have', 'has', 'had', 'having', 'do', 'does',
+                       'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if',
+                       'or', 'because', 'as', 'until', 'while', 'of', 'at',
+                       'by', 'for', 'with', 'about', 'against', 'between',
+                       'into', 'through', 'during', 'before', 'after', 'above',
+                       'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on',
+                       'off', 'over', 'under', 'again', 'further', 'then',
+                       'once', 'here', 'there', 'when', 'where', 'why', 'how',
+                       'all', 'any', 'both', 'each', 'few', 'more', 'most',
+                       'other', 'some', 'such', 'no', 'nor', 'not', 'only',
+                       'own', 'same', 'so', 'than', 'too', 'very', 's', 't',
+                       'can', 'will', 'just', 'don', 'should', 'now'])
+
+
+@lru_cache(maxsize=None)
+def load_stopwords(source='builtin', language='english'):
+    """
+        Load a set of stopwords. Each source is loaded only once and cached.
 
-        # Remove non-ASCII special characters
-        data[text_col] = re.sub(r'[^\x00-\x7F]+', '', data[text_col])
+        Args:
+            source (str): Where to load the stopwords from: 'builtin' for the
+                          built-in list, 'nltk' for the NLTK stopwords corpus,
+                          or the path to a text file with one stopword per
+                          line.
+            language (str): The language of the NLTK stopwords.
 
-        # Remove any words that starts with a symbol
-        data[text_col] = re.sub(r'[@;:\']\b\S+\b', '', data[text_col])
+        Returns:
+            frozenset: The stopwords, in lowercase.
+    """
+    if source == 'builtin':
+        return STOPWORDS
+    if source == 'nltk':
+        return frozenset(word.lower() for word in
+                         nltk.corpus.stopwords.words(language))
 
-        # Remove symbols
-        data[text_col] = re.sub(r'[^a-zA-Z0-9\s]', '', data[text_col])
+    with open(source, 'r', encoding='utf-8') as file:
+        return frozenset(line.strip().lower() for line in file
+                         if line.strip())
 
-        # Remove numbers
-        data[text_col] = re.sub(r'\d+', '', data[text_col])
 
-        # Convert text to lowercase and trim
-        data[text_col] = data[text_col].lower().strip()
+def _resolve_stopwords(stopwords):
+    """
+        Return the stopwords as a frozenset. A string is taken as a source
+        for `load_stopwords`.
+    """
+    if isinstance(stopwords, str):
+        return load_stopwords(stopwords)
+    if isinstance(stopwords, frozenset):
+        return stopwords
+    return frozenset(stopwords)
 
 
-def remove_stopwords(dataset, text_col='text'):
+@instrumented
+def remove_stopwords(dataset, text_col='text', stopwords=STOPWORDS):
     """
         Remove stopwords from the text data in the dataset.
 
         Args:
             dataset (list): The dataset to process.
             text_col (str): The name of the column containing the text data.
+            stopwords (str or set): The stopwords to remove, or a source to
+                                    load them from (see `load_stopwords`).
+                                    Defaults to the built-in list.
     """
-    stopwords = ['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves',
-                 'you', 'your', 'yours', 'yourself', 'yourselves', 'he', 'him',
-                 'his', 'himself', 'she', 'her',  'hers', 'herself', 'it',
-                 'its', 'itself', 'they', 'them', 'their', 'theirs',
-                 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that',
-                 'these', 'those', 'am', 'is', 'are', 'was', 'were', 'be',
-                 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does',
-                 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or',
-                 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for',
-                 'with', 'about', 'against', 'between', 'into', 'through',
-                 'during', 'before', 'after', 'above', 'below', 'to', 'from',
-                 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under',
-                 'again', 'further', 'then', 'once', 'here', 'there', 'when',
-                 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few',
-                 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not',
-                 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't',
-                 'can', 'will', 'just', 'don', 'should', 'now']
+    stopwords = _resolve_stopwords(stopwords)
 
     for data in dataset:
         text = data[text_col]
         words = text.split()
-        filtered_words = [word for word in words if word.lower()
-                          not in stopwords]
+        if text.islower():
+            # Already lowercase, e.g. after `preprocess_text`
+            filtered_words = [word for word in words if word not in stopwords]
+        else:
+            filtered_words = [word for word in words if word.lower()
+                              not in stopwords]
         processed_text = ' '.join(filtered_words)
         data[text_col] = processed_text
+    if isinstance(dataset, ColumnarDataset):
+        dataset.pack(text_col)
+
+
+# Words counted by the term frequency functions
+WORD_PATTERN = re.compile(r'\b\w+\b')
 
 
+@instrumented
 def get_term_frequencies(dataset, text_col='text'):
     """
         Get the term frequencies for each entry in the dataset's text column.
@@ -148,7 +838,7 @@ def get_term_frequencies(dataset, text_col='text'):
         tweet = data[text_col]
         term_frequency = defaultdict(int)
 
-        words = re.findall(r'\b\w+\b', tweet)
+        words = WORD_PATTERN.findall(tweet)
         for word in words:
             term_frequency[word] += 1
 
@@ -157,6 +847,7 @@ def get_term_frequencies(dataset, text_col='text'):
     return term_frequencies
 
 
+@instrumented
 def get_vocabulary(dataset, text_col='text'):
     """
         Get the vocabulary (unique words) in the dataset.
@@ -176,158 +867,1814 @@ def get_vocabulary(dataset, text_col='text'):
     return list(vocabulary)
 
 
-def print_sorted_list(words_list, count=10):
+class Vocabulary:
     """
-        Sort and print the list of words.
+        Map words to dense integer IDs, assigned in order of first
+        appearance.
 
-        Args:
-            words_list (list): The list of words.
-            count (int): Number of words to print.
+        Attributes:
+            ids (dict): The ID of each word.
+            words (list): The word of each ID.
     """
-    sorted_words = sorted(words_list)
-    for word in sorted_words[:count]:
-        print(word)
 
+    def __init__(self, words=()):
+        self.ids = {}
+        self.words = []
+        self.update(words)
 
-def add_term_frequency_col(dataset, term_frequencies,
-                           col_name='term_frequency'):
-    """
-        Add a column to the dataset containing the term frequencies.
+    def __len__(self):
+        return len(self.words)
 
-        Args:
-            dataset (list): The dataset to modify.
-            term_frequencies (list): The list of term frequencies.
-            col_name (str): The name of the new column.
-    """
+    def __contains__(self, word):
+        return word in self.ids
 
-    for i, data in enumerate(dataset):
-        data[col_name] = term_frequencies[i]
+    def __getitem__(self, word):
+        return self.ids[word]
 
+    def add(self, word):
+        """
+            Add a word to the vocabulary if it is not already in it.
 
-def write_to_csv(dataset, output_file='data/twitter_processed.csv'):
-    """
-        Write the dataset to a CSV file.
+            Args:
+                word (str): The word to add.
 
-        Args:
-            dataset (list): The dataset to write.
-            output_file (str): Path to the output CSV file.
-    """
+            Returns:
+                int: The ID of the word.
+        """
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
 
-    # Extract the keys from the first record to use as column headers
-    headers = dataset[0].keys()
+    def update(self, words):
+        """
+            Add several words to the vocabulary.
 
-    # Write the dataset to a CSV file
-    with open(output_file, 'w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(dataset)
+            Args:
+                words (iterable): The words to add.
+        """
+        for word in words:
+            self.add(word)
 
-    print(f"\nProcessed dataset saved to {output_file}")
+    def save(self, file):
+        """
+            Save the vocabulary to a text file, one word per line in order
+            of ID. The file is replaced atomically, so a failed save keeps
+            the previous version.
 
+            Args:
+                file (str): Path to the output file.
+        """
+        tmp_file = f'{file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8', newline='\n') as output:
+            output.writelines(f'{word}\n' for word in self.words)
+        os.replace(tmp_file, file)
 
-def find_num_clusters(dataset, col_name='sentiment'):
-    """
-        Find the number of clusters in a dataset based on a specified column.
+    @classmethod
+    def load(cls, file):
+        """
+            Load a vocabulary saved with `save`.
 
-        Args:
-            dataset (list): The dataset to analyze.
-            col_name (str): The name of the column containing the cluster
-                            information.
+            Args:
+                file (str): Path to the file.
 
-    """
-    sentiment_values = set(data[col_name] for data in dataset)
-    num_clusters = len(sentiment_values)
-    print(f"\nThe dataset has {num_clusters} clusters in "
-          f"the {col_name} column.")
+            Returns:
+                Vocabulary: The loaded vocabulary, with the same IDs.
+        """
+        with open(file, 'r', encoding='utf-8', newline='\n') as input_file:
+            return cls(line[:-1] for line in input_file)
 
 
-def find_empty_percentage(dataset, text_col='text'):
+class TermMatrix:
+    """
+        Sparse document-term matrix in CSR format: the term counts of row `i`
+        are `data[indptr[i]:indptr[i + 1]]` and their term IDs are
+        `indices[indptr[i]:indptr[i + 1]]`.
+
+        Within a row the terms keep their order of first appearance, so
+        `to_dicts` gives back exactly the output of `get_term_frequencies`.
+
+        Attributes:
+            indptr (numpy.ndarray): Row offsets into `indices` and `data`.
+            indices (numpy.ndarray): Term IDs.
+            data (numpy.ndarray): Term counts.
+            vocabulary (Vocabulary): The vocabulary of the term IDs.
     """
-        Find the percentage of empty elements in a specific column of
-        a dataset.
 
-        Args:
-            dataset (list): The dataset to analyze.
-            text_col (str): The name of the column to check for empty elements.
+    def __init__(self, indptr, indices, data, vocabulary):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.vocabulary = vocabulary
 
-    """
+    def __len__(self):
+        return len(self.indptr) - 1
 
-    empty = 0
+    @property
+    def shape(self):
+        """
+            tuple: The number of rows and the number of terms.
+        """
+        return len(self), len(self.vocabulary)
 
-    for data in dataset:
-        if not data[text_col]:
-            empty += 1
+    @property
+    def nbytes(self):
+        """
+            int: The size in bytes of the matrix arrays.
+        """
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
 
-    if empty > 0:
-        print(f"\nThere are empty elements in the {text_col}")
-        empty_percentage = (empty / len(dataset)) * 100
-        print(f"The percentage of empty elements in the {text_col} "
-              f"column is: {empty_percentage:.2f}%")
+    def row(self, i):
+        """
+            Get the term frequencies of one row.
 
-    else:
-        print(f"There are no empty elements in the {text_col}")
+            Args:
+                i (int): The row index.
 
+            Returns:
+                dict: The term frequencies of the row.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        words = self.vocabulary.words
+        return {words[term_id]: count for term_id, count in
+                zip(self.indices[start:end].tolist(),
+                    self.data[start:end].tolist())}
 
-def eliminate_null_elements(dataset, text_col='text'):
+    def to_dicts(self):
+        """
+            Convert the matrix to the per-row dictionaries returned by
+            `get_term_frequencies`.
+
+            Returns:
+                list: A list of dictionaries representing the term
+                      frequencies for each row.
+        """
+        words = self.vocabulary.words
+        terms = [words[term_id] for term_id in self.indices.tolist()]
+        counts = self.data.tolist()
+        bounds = self.indptr.tolist()
+        return [dict(zip(terms[start:end], counts[start:end]))
+                for start, end in zip(bounds, bounds[1:])]
+
+
+@instrumented
+def get_term_matrix(dataset, text_col='text', vocabulary=None):
     """
-        Eliminate records with null or empty values in a specific column from
-        a dataset.
+        Get the term frequencies of the dataset as a sparse document-term
+        matrix with integer term IDs.
 
         Args:
             dataset (list): The dataset to process.
-            text_col (str): The name of the column to check for null or empty
-            values.
+            text_col (str): The name of the column containing the text data.
+            vocabulary (Vocabulary): The vocabulary to use. New words are
+                                     added to it, so the same vocabulary can
+                                     be shared by the matrices of several
+                                     batches. A new one is created if None.
 
         Returns:
-            list: The updated dataset with null or empty records removed.
+            TermMatrix: The document-term matrix of the dataset.
     """
+    if vocabulary is None:
+        vocabulary = Vocabulary()
 
-    dataset = [data for data in dataset if data[text_col]]
-    return dataset
+    indptr = array('q', [0])
+    indices = array('i')
+    data = array('i')
+    add_word = vocabulary.add
 
+    for row in dataset:
+        term_frequency = Counter(WORD_PATTERN.findall(row[text_col]))
+        indices.extend(add_word(word) for word in term_frequency)
+        data.extend(term_frequency.values())
+        indptr.append(len(indices))
 
-def generate_word_clouds_for_clusters(dataset, cluster_col='sentiment',
-                                      text_col='text',
-                                      output_dir='word_cloud_plots'):
+    return TermMatrix(np.frombuffer(indptr, dtype=np.int64),
+                      np.frombuffer(indices, dtype=np.int32),
+                      np.frombuffer(data, dtype=np.int32),
+                      vocabulary)
+
+
+def _row_ids(matrix):
     """
-        Generate word clouds for each cluster in a dataset based on a
-        specified column.
+        The row of each stored value of a term matrix.
+    """
+    return np.repeat(np.arange(len(matrix)), np.diff(matrix.indptr))
 
-        Args:
-            dataset (list): The dataset containing the records.
-            cluster_col (str): The name of the column representing the
-                               clusters.
-            text_col (str): The name of the column containing the text data.
-            output_dir (str): The directory to save the generated word cloud
-                              plots.
 
+def document_frequencies(matrix):
     """
-    cluster_data = {}
+        Count the rows of a term matrix that contain each word.
 
-    # group records by cluster
-    for data in dataset:
-        cluster = data[cluster_col]
-        text = data[text_col]
-        if cluster in cluster_data:
-            cluster_data[cluster].append(text)
-        else:
-            cluster_data[cluster] = [text]
+        Args:
+            matrix (TermMatrix): The term matrix.
 
-    # generate word cloud for each cluster
-    for cluster, records in cluster_data.items():
-        print("\nGenerating word cloud for cluster ", cluster)
-        combined_text = ' '.join(records)
+        Returns:
+            numpy.ndarray: The document frequency of each word ID.
+    """
+    return np.bincount(matrix.indices, minlength=len(matrix.vocabulary))
 
-        # tokenize words
-        words = nltk.word_tokenize(combined_text)
 
-        # create word frequency dictionary
-        word_freq = nltk.FreqDist(words)
+def tfidf(matrix, norm='l2', smooth_idf=True, sublinear_tf=False):
+    """
+        Weight the term counts of a term matrix by TF-IDF, with array
+        operations over the whole corpus.
 
-        # generate word cloud
-        wordcloud = WordCloud().generate_from_frequencies(word_freq)
+        The inverse document frequency of a word is log(n / df) + 1 for n
+        rows, or log((1 + n) / (1 + df)) + 1 with `smooth_idf`, which
+        behaves as if a row contained every word.
 
-        # save word cloud plot
+        Args:
+            matrix (TermMatrix): The term counts (see `get_term_matrix`).
+            norm (str): 'l2' to scale each row to unit length, 'l1' to scale
+                        its weights to sum 1, or None.
+            smooth_idf (bool): Whether to smooth the document frequencies.
+            sublinear_tf (bool): Whether to use 1 + log(count) instead of the
+                                 count.
+
+        Returns:
+            tuple: A `TermMatrix` with the same rows and words and the TF-IDF
+                   weights as float data, and the inverse document frequency
+                   of each word ID.
+    """
+    if norm not in ('l1', 'l2', None):
+        raise ValueError(f"Unknown norm: {norm!r}")
+
+    num_rows = len(matrix) + int(smooth_idf)
+    df = document_frequencies(matrix) + int(smooth_idf)
+    with np.errstate(divide='ignore'):
+        idf = np.log(num_rows / df) + 1.0
+
+    tf = matrix.data.astype(np.float64)
+    if sublinear_tf:
+        tf = np.log(tf) + 1.0
+    weights = tf * idf[matrix.indices]
+
+    if norm is not None:
+        values = weights ** 2 if norm == 'l2' else np.abs(weights)
+        norms = np.bincount(_row_ids(matrix), weights=values,
+                            minlength=len(matrix))
+        if norm == 'l2':
+            norms = np.sqrt(norms)
+        norms[norms == 0] = 1.0
+        weights /= np.repeat(norms, np.diff(matrix.indptr))
+
+    return (TermMatrix(matrix.indptr, matrix.indices, weights,
+                       matrix.vocabulary),
+            idf)
+
+
+class FeatureHasher:
+    """
+        Map words to a fixed number of buckets with a stable hash (CRC-32),
+        so term frequencies take bounded memory without a vocabulary, at the
+        cost of merging the counts of the words that share a bucket.
+
+        The hasher can be used as the vocabulary of a `TermMatrix`: its
+        length is the number of buckets, and the "words" are the bucket
+        numbers. Optionally, the most frequent words seen are tracked in a
+        `SpaceSaving` side table of bounded size, to show the words of the
+        top buckets.
+
+        Attributes:
+            num_buckets (int): The number of buckets.
+            terms (SpaceSaving): The approximate counts of the most frequent
+                                 words, or None if they are not tracked.
+    """
+
+    def __init__(self, num_buckets=1 << 20, track_terms=None):
+        if num_buckets < 1:
+            raise ValueError("num_buckets must be a positive integer")
+        self.num_buckets = num_buckets
+        self.terms = SpaceSaving(track_terms) if track_terms else None
+
+    def __len__(self):
+        return self.num_buckets
+
+    @property
+    def words(self):
+        """
+            range: The bucket numbers, which stand for the words in a
+                   `TermMatrix`.
+        """
+        return range(self.num_buckets)
+
+    def bucket(self, word):
+        """
+            Get the bucket of a word, which is the same in every process and
+            run.
+
+            Args:
+                word (str): The word.
+
+            Returns:
+                int: The bucket of the word.
+        """
+        return zlib.crc32(word.encode('utf-8')) % self.num_buckets
+
+    def transform(self, dataset, text_col='text'):
+        """
+            Count the words of each row by bucket, as `get_term_matrix` does
+            by word.
+
+            Args:
+                dataset (list): The dataset to process.
+                text_col (str): The name of the column containing the text
+                                data.
+
+            Returns:
+                TermMatrix: The counts of each bucket in each row, with this
+                            hasher as vocabulary.
+        """
+        indptr = array('q', [0])
+        indices = array('i')
+        data = array('i')
+        bucket = self.bucket
+
+        for row in dataset:
+            words = WORD_PATTERN.findall(row[text_col])
+            if self.terms is not None:
+                self.terms.update(words)
+            bucket_counts = Counter(map(bucket, words))
+            indices.extend(bucket_counts.keys())
+            data.extend(bucket_counts.values())
+            indptr.append(len(indices))
+
+        return TermMatrix(np.frombuffer(indptr, dtype=np.int64),
+                          np.frombuffer(indices, dtype=np.int32),
+                          np.frombuffer(data, dtype=np.int32),
+                          self)
+
+    def cluster_counts(self, dataset, text_col='text',
+                       cluster_col='sentiment', counts=None,
+                       chunk_size=10000):
+        """
+            Count the words of each cluster by bucket, as
+            `get_cluster_term_frequencies` does by word.
+
+            The words of each chunk of rows are counted in a dictionary
+            first, so each distinct word of a chunk is hashed once, and the
+            counts are then added to the bucket arrays.
+
+            Args:
+                dataset (iterable): The dataset to process.
+                text_col (str): The name of the column containing the text
+                                data.
+                cluster_col (str): The name of the column representing the
+                                   clusters.
+                counts (dict): Counts to update, e.g. from a previous batch.
+                chunk_size (int): Maximum number of rows counted before
+                                  adding their counts to the buckets, which
+                                  bounds the size of the dictionaries.
+
+            Returns:
+                dict: An array with the count of each bucket for each
+                      cluster.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+        if counts is None:
+            counts = {}
+        rows = iter(dataset)
+        while True:
+            cluster_words = defaultdict(Counter)
+            for data in islice(rows, chunk_size):
+                cluster_words[data[cluster_col]].update(
+                    WORD_PATTERN.findall(data[text_col]))
+            if not cluster_words:
+                return counts
+            for cluster, words in cluster_words.items():
+                self._add_counts(counts, cluster, words)
+
+    def _add_counts(self, counts, cluster, words):
+        """
+            Add the word-frequency pairs of a cluster to its bucket counts.
+        """
+        if self.terms is not None:
+            self.terms.update(words)
+        if cluster not in counts:
+            counts[cluster] = np.zeros(self.num_buckets, dtype=np.int64)
+        buckets = np.fromiter(map(self.bucket, words), dtype=np.int64,
+                              count=len(words))
+        # Words of the same bucket are added together
+        np.add.at(counts[cluster], buckets,
+                  np.fromiter(words.values(), dtype=np.int64,
+                              count=len(words)))
+
+    def reverse_buckets(self):
+        """
+            Get the most frequent tracked word of each bucket.
+
+            Returns:
+                dict: The word of each bucket that has a tracked word.
+        """
+        if self.terms is None:
+            raise ValueError("The words are not tracked, see track_terms")
+        words = {}
+        for word, _ in reversed(self.terms.most_common()):
+            words[self.bucket(word)] = word
+        return words
+
+    def top_buckets(self, bucket_counts, count=20):
+        """
+            Get the buckets with the highest counts, labelled by their most
+            frequent tracked word, e.g. to plot them with
+            `generate_cluster_histograms`.
+
+            Args:
+                bucket_counts (numpy.ndarray): The count of each bucket, e.g.
+                                               of a cluster.
+                count (int): Number of buckets.
+
+            Returns:
+                list: (label, count) pairs from the highest count. The label
+                      is the word of the bucket, or '#' and the bucket number
+                      if its words are not tracked.
+        """
+        words = self.reverse_buckets() if self.terms is not None else {}
+        count = min(count, len(bucket_counts))
+        if count == 0:
+            return []
+        top = np.argpartition(-bucket_counts, count - 1)[:count]
+        top = top[np.argsort(-bucket_counts[top], kind='stable')]
+        return [(words.get(bucket, f'#{bucket}'), int(bucket_counts[bucket]))
+                for bucket in top.tolist() if bucket_counts[bucket] > 0]
+
+
+class CleaningCache:
+    """
+        Bounded LRU cache of the cleaned words of each raw text, so repeated
+        texts such as retweets are normalized and filtered only once. When it
+        is full, the least recently used text is evicted.
+
+        The words are those of `process_dataset`: the text is normalized,
+        split and its stopwords are removed. The cache is bound to its
+        stopwords, and it can be shared by several threads.
+
+        Attributes:
+            max_size (int): Maximum number of texts kept.
+            stopwords (frozenset): The stopwords removed from the words.
+            hits (int): Number of lookups found in the cache.
+            misses (int): Number of lookups that had to clean the text.
+            evictions (int): Number of texts evicted to make room.
+    """
+
+    def __init__(self, max_size=100000, stopwords=STOPWORDS):
+        if max_size < 1:
+            raise ValueError("max_size must be a positive integer")
+        self.max_size = max_size
+        self.stopwords = _resolve_stopwords(stopwords)
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clean(self, text):
+        """
+            Get the cleaned words of a text, from the cache if possible.
+
+            Args:
+                text (str): The raw text.
+
+            Returns:
+                tuple: The words of the text without stopwords.
+        """
+        entries = self._entries
+        with self._lock:
+            words = entries.get(text)
+            if words is not None:
+                entries.move_to_end(text)
+                self.hits += 1
+                return words
+
+            self.misses += 1
+            stopwords = self.stopwords
+            words = entries[text] = tuple([
+                word for word in normalize_text(text).split()
+                if word not in stopwords])
+            if len(entries) > self.max_size:
+                entries.popitem(last=False)
+                self.evictions += 1
+            return words
+
+    @property
+    def hit_rate(self):
+        """
+            float: The fraction of lookups found in the cache.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+            Returns:
+                dict: The hits, misses, evictions, hit rate, size and maximum
+                      size of the cache.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': self.hit_rate,
+                    'size': len(self._entries), 'max_size': self.max_size}
+
+    def take_counts(self):
+        """
+            Get the hits, misses and evictions counted since the last call
+            and reset them, e.g. to report them from a worker process.
+
+            Returns:
+                tuple: The hits, misses and evictions.
+        """
+        with self._lock:
+            counts = (self.hits, self.misses, self.evictions)
+            self.hits = self.misses = self.evictions = 0
+        return counts
+
+    def add_counts(self, hits, misses, evictions):
+        """
+            Add the counts of another cache, e.g. the cache of a worker
+            process, to the statistics of this one.
+        """
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def clear(self):
+        """
+            Remove all the texts and reset the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+# Cache of a worker process, created by `_init_worker_cache`
+_worker_cache = None
+
+
+def _init_worker_cache(max_size, stopwords):
+    global _worker_cache
+    _worker_cache = CleaningCache(max_size, stopwords)
+
+
+def _take_worker_counts():
+    """
+        The counts of the worker cache since the last batch, if there is one.
+    """
+    return _worker_cache.take_counts() if _worker_cache is not None else None
+
+
+@instrumented
+def process_dataset(dataset, text_col='text', clean_text=True,
+                    term_frequencies=True, vocabulary=True,
+                    stopwords=STOPWORDS, cache=None):
+    """
+        Preprocess the text, remove stopwords, get the term frequencies and
+        the vocabulary of the dataset in a single pass.
+
+        Each text is normalized and split into words once, and the same words
+        are used for every output. The results are the same as running
+        `preprocess_text`, `remove_stopwords`, `get_term_frequencies` and
+        `get_vocabulary` one after another. Each output can be turned off.
+
+        Args:
+            dataset (list): The dataset to process.
+            text_col (str): The name of the column containing the text data.
+            clean_text (bool): Whether to replace the text in the dataset with
+                               the processed text.
+            term_frequencies (bool): Whether to get the term frequencies.
+            vocabulary (bool): Whether to get the vocabulary.
+            stopwords (str or set): The stopwords to remove, or a source to
+                                    load them from (see `load_stopwords`).
+            cache (CleaningCache): A cache of the words of each text, with
+                                   the same stopwords.
+
+        Returns:
+            tuple: The list of term frequencies for each entry and the list of
+                   unique words in the dataset. An output that is turned off
+                   is None.
+    """
+    stopwords = _resolve_stopwords(stopwords)
+    if cache is not None and cache.stopwords != stopwords:
+        raise ValueError("The cache was built with different stopwords")
+    frequencies = [] if term_frequencies else None
+    words_seen = set() if vocabulary else None
+
+    for data in dataset:
+        if cache is not None:
+            words = cache.clean(data[text_col])
+        else:
+            # The normalized text is already lowercase
+            words = [word for word in normalize_text(data[text_col]).split()
+                     if word not in stopwords]
+
+        if clean_text:
+            data[text_col] = ' '.join(words)
+        if term_frequencies:
+            frequencies.append(dict(Counter(words)))
+        if vocabulary:
+            words_seen.update(words)
+
+    if clean_text and isinstance(dataset, ColumnarDataset):
+        dataset.pack(text_col)
+    if vocabulary:
+        words_seen = list(words_seen)
+    return frequencies, words_seen
+
+
+def _process_texts(texts, stopwords=STOPWORDS):
+    """
+        Run the per-row stages over a batch of texts in a worker process.
+
+        Args:
+            texts (list): The texts to process.
+            stopwords (str or set): The stopwords to remove.
+
+        Returns:
+            tuple: The processed texts, their term frequencies and the counts
+                   of the worker cache (see `_init_worker_cache`), or None.
+    """
+    batch = [{'text': text} for text in texts]
+    term_frequencies, _ = process_dataset(batch, vocabulary=False,
+                                          stopwords=stopwords,
+                                          cache=_worker_cache)
+    return ([data['text'] for data in batch], term_frequencies,
+            _take_worker_counts())
+
+
+def _map_batches(function, batches, workers, initializer=None):
+    """
+        Apply a function to each batch in a process pool and yield the
+        results in the original order.
+
+        At most two batches per worker are in flight at any time, so the
+        batches can come from a stream without being all pickled upfront.
+
+        Args:
+            function (callable): A module-level function to apply.
+            batches (iterable): The batches to process.
+            workers (int): Number of worker processes.
+            initializer (callable): A module-level function called once in
+                                    each worker process when it starts.
+
+        Yields:
+            The result of `function` for each batch, in order.
+    """
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=initializer) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(function, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+@instrumented
+def process_in_parallel(dataset, text_col='text', workers=None,
+                        batch_size=1000, stopwords=STOPWORDS, cache=None):
+    """
+        Preprocess the text, remove stopwords and get the term frequencies
+        of the dataset using a pool of worker processes.
+
+        The dataset is split in batches of `batch_size` rows. Only the text
+        of each row is sent to the workers, and the processed texts are
+        written back to the dataset in the original order. The result is the
+        same as running `preprocess_text`, `remove_stopwords` and
+        `get_term_frequencies` one after another.
+
+        Args:
+            dataset (list): The dataset to process.
+            text_col (str): The name of the column containing the text data.
+            workers (int): Number of worker processes. Defaults to the number
+                           of CPUs.
+            batch_size (int): Number of rows sent to a worker at a time.
+            stopwords (str or set): The stopwords to remove, or a source to
+                                    load them from (see `load_stopwords`).
+                                    A source is loaded once per worker.
+            cache (CleaningCache): Each worker gets an empty cache with its
+                                   size and stopwords, and the hits and
+                                   misses of the workers are added to it.
+
+        Returns:
+            list: A list of dictionaries representing the term frequencies
+                  for each entry.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    workers = workers or os.cpu_count() or 1
+
+    batches = ([data[text_col] for data in dataset[start:start + batch_size]]
+               for start in range(0, len(dataset), batch_size))
+
+    if cache is not None:
+        stopwords = _resolve_stopwords(stopwords)
+        if cache.stopwords != stopwords:
+            raise ValueError("The cache was built with different stopwords")
+        initializer = partial(_init_worker_cache, cache.max_size, stopwords)
+    else:
+        initializer = None
+        if not isinstance(stopwords, str):
+            stopwords = _resolve_stopwords(stopwords)
+    process_texts = partial(_process_texts, stopwords=stopwords)
+
+    term_frequencies = []
+    for texts, batch_frequencies, counts in _map_batches(
+            process_texts, batches, workers, initializer):
+        if counts is not None:
+            cache.add_counts(*counts)
+        start = len(term_frequencies)
+        for data, text in zip(dataset[start:start + len(texts)], texts):
+            data[text_col] = text
+        term_frequencies.extend(batch_frequencies)
+
+    if isinstance(dataset, ColumnarDataset):
+        dataset.pack(text_col)
+    return term_frequencies
+
+
+# Bumped when the layout of the corpus cache changes
+CORPUS_CACHE_VERSION = 1
+
+
+def file_digest(file, chunk_size=1 << 20):
+    """
+        Get the SHA-256 hash of the contents of a file.
+
+        Args:
+            file (str): Path to the file.
+            chunk_size (int): Number of bytes read at a time.
+
+        Returns:
+            str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(file, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def corpus_cache_key(file, text_col='text', cluster_col='sentiment',
+                     stopwords=STOPWORDS):
+    """
+        Get the key of the cached corpus of a file. It changes whenever the
+        contents of the file or the preprocessing settings change.
+
+        Args:
+            file (str): Path to the source CSV file.
+            text_col (str): The name of the column containing the text data.
+            cluster_col (str): The name of the column representing the
+                               clusters.
+            stopwords (str or set): The stopwords removed from the text.
+
+        Returns:
+            str: The hexadecimal key.
+    """
+    settings = {'version': CORPUS_CACHE_VERSION,
+                'source': file_digest(file),
+                'text_col': text_col,
+                'cluster_col': cluster_col,
+                'stopwords': sorted(_resolve_stopwords(stopwords))}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True)
+                          .encode('utf-8')).hexdigest()
+
+
+class CorpusCache:
+    """
+        Columnar representation of a processed corpus that can be saved to
+        disk and memory-mapped back.
+
+        The cleaned texts are stored as one UTF-8 buffer with row offsets,
+        the sentiment labels as integer codes, and the words of each text as
+        token IDs in CSR layout.
+
+        Attributes:
+            text_data (numpy.ndarray): UTF-8 bytes of all the texts.
+            text_offsets (numpy.ndarray): Offsets of each text in `text_data`.
+            labels (numpy.ndarray): Label code of each row.
+            label_names (list): The label of each code.
+            token_indptr (numpy.ndarray): Offsets of each row in
+                                          `token_ids`.
+            token_ids (numpy.ndarray): Token IDs of the words of each text.
+            vocabulary (Vocabulary): The vocabulary of the token IDs.
+    """
+
+    ARRAYS = ('text_data', 'text_offsets', 'labels', 'token_indptr',
+              'token_ids')
+
+    def __init__(self, text_data, text_offsets, labels, label_names,
+                 token_indptr, token_ids, vocabulary):
+        self.text_data = text_data
+        self.text_offsets = text_offsets
+        self.labels = labels
+        self.label_names = label_names
+        self.token_indptr = token_indptr
+        self.token_ids = token_ids
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    @classmethod
+    def from_dataset(cls, dataset, text_col='text', cluster_col='sentiment'):
+        """
+            Build the cache of a processed dataset.
+
+            Args:
+                dataset (iterable): The processed records.
+                text_col (str): The name of the column containing the text
+                                data.
+                cluster_col (str): The name of the column representing the
+                                   clusters.
+
+            Returns:
+                CorpusCache: The cache of the dataset.
+        """
+        text_data = bytearray()
+        text_offsets = array('q', [0])
+        labels = array('i')
+        label_codes = {}
+        token_indptr = array('q', [0])
+        token_ids = array('i')
+        vocabulary = Vocabulary()
+        add_word = vocabulary.add
+
+        for data in dataset:
+            text = data[text_col]
+            text_data += text.encode('utf-8')
+            text_offsets.append(len(text_data))
+            labels.append(label_codes.setdefault(data[cluster_col],
+                                                 len(label_codes)))
+            token_ids.extend(add_word(word) for word in text.split())
+            token_indptr.append(len(token_ids))
+
+        return cls(np.frombuffer(text_data, dtype=np.uint8),
+                   np.frombuffer(text_offsets, dtype=np.int64),
+                   np.frombuffer(labels, dtype=np.int32),
+                   list(label_codes),
+                   np.frombuffer(token_indptr, dtype=np.int64),
+                   np.frombuffer(token_ids, dtype=np.int32),
+                   vocabulary)
+
+    def text(self, i):
+        """
+            Returns:
+                str: The text of row `i`.
+        """
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return self.text_data[start:end].tobytes().decode('utf-8')
+
+    def label(self, i):
+        """
+            Returns:
+                str: The label of row `i`.
+        """
+        return self.label_names[self.labels[i]]
+
+    def tokens(self, i):
+        """
+            Returns:
+                numpy.ndarray: The token IDs of the words of row `i`.
+        """
+        return self.token_ids[self.token_indptr[i]:self.token_indptr[i + 1]]
+
+    def to_dataset(self, text_col='text', cluster_col='sentiment'):
+        """
+            Convert the cache back to a list of records.
+
+            Returns:
+                list: A list of dictionaries with the text and the label of
+                      each row.
+        """
+        return [{cluster_col: self.label(i), text_col: self.text(i)}
+                for i in range(len(self))]
+
+    def save(self, directory):
+        """
+            Save the cache to a directory, one `.npy` file per array. The
+            directory is written under a unique temporary name and renamed
+            at the end, so an interrupted save never leaves a partial cache.
+            If another process has saved the directory in the meantime, its
+            cache is kept.
+
+            Args:
+                directory (str): Path to the output directory.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp_directory = tempfile.mkdtemp(
+            prefix=f'.{os.path.basename(directory)}.', dir=parent)
+        try:
+            for name in self.ARRAYS:
+                np.save(os.path.join(tmp_directory, f'{name}.npy'),
+                        getattr(self, name))
+            with open(os.path.join(tmp_directory, 'meta.json'), 'w',
+                      encoding='utf-8') as file:
+                json.dump({'label_names': self.label_names,
+                           'words': self.vocabulary.words}, file)
+            try:
+                os.replace(tmp_directory, directory)
+            except OSError:
+                # Another builder of the same cache finished first
+                if not os.path.isdir(directory):
+                    raise
+        finally:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+            Load a cache saved with `save`.
+
+            Args:
+                directory (str): Path to the cache directory.
+                mmap (bool): Whether to memory-map the arrays instead of
+                             reading them into memory.
+
+            Returns:
+                CorpusCache: The loaded cache.
+        """
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'),
+                                mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        with open(os.path.join(directory, 'meta.json'), 'r',
+                  encoding='utf-8') as file:
+            meta = json.load(file)
+        return cls(label_names=meta['label_names'],
+                   vocabulary=Vocabulary(meta['words']), **arrays)
+
+
+@instrumented
+def load_processed_corpus(file="data/twitter_reduced.csv",
+                          cache_dir='data/cache', text_col='text',
+                          cluster_col='sentiment', stopwords=STOPWORDS,
+                          chunk_size=10000):
+    """
+        Load the processed corpus of a CSV file from the cache, or process
+        the file and cache it if it is not there yet.
+
+        The cache entry is keyed by the hash of the file and the
+        preprocessing settings, so it is rebuilt when any of them change.
+
+        Args:
+            file (str): Path to the source CSV file.
+            cache_dir (str): The directory where the caches are kept.
+            text_col (str): The name of the column containing the text data.
+            cluster_col (str): The name of the column representing the
+                               clusters.
+            stopwords (str or set): The stopwords to remove.
+            chunk_size (int): Number of rows processed at a time.
+
+        Returns:
+            CorpusCache: The processed corpus, memory-mapped from disk.
+    """
+    key = corpus_cache_key(file, text_col, cluster_col, stopwords)
+    directory = os.path.join(cache_dir, key)
+
+    if not os.path.isdir(directory):
+        def processed_rows():
+            for batch in iter_data(file, chunk_size):
+                process_dataset(batch, text_col, term_frequencies=False,
+                                vocabulary=False, stopwords=stopwords)
+                yield from batch
+
+        CorpusCache.from_dataset(processed_rows(), text_col,
+                                 cluster_col).save(directory)
+
+    return CorpusCache.load(directory)
+
+
+def print_sorted_list(words_list, count=10):
+    """
+        Sort and print the list of words.
+
+        Args:
+            words_list (list): The list of words.
+            count (int): Number of words to print.
+    """
+    sorted_words = sorted(words_list)
+    for word in sorted_words[:count]:
+        print(word)
+
+
+@instrumented
+def add_term_frequency_col(dataset, term_frequencies,
+                           col_name='term_frequency'):
+    """
+        Add a column to the dataset containing the term frequencies.
+
+        Args:
+            dataset (list): The dataset to modify.
+            term_frequencies (list): The list of term frequencies.
+            col_name (str): The name of the new column.
+    """
+
+    for i, data in enumerate(dataset):
+        data[col_name] = term_frequencies[i]
+
+
+@instrumented
+def write_to_csv(dataset, output_file='data/twitter_processed.csv',
+                 append=False):
+    """
+        Write the dataset to a CSV file.
+
+        Args:
+            dataset (list): The dataset to write.
+            output_file (str): Path to the output CSV file.
+            append (bool): Whether to append the rows to an existing file
+                           without writing the header again, so a dataset
+                           can be written batch by batch (see `iter_data`).
+    """
+
+    # Extract the keys from the first record to use as column headers
+    headers = dataset[0].keys()
+
+    # Write the dataset to a CSV file
+    with open(output_file, 'a' if append else 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=headers)
+        if not append:
+            writer.writeheader()
+        writer.writerows(dataset)
+
+    if not append:
+        print(f"\nProcessed dataset saved to {output_file}")
+
+
+# Ways to store the term frequency column in a CSV file (see
+# `encode_term_frequencies`)
+TERM_FREQUENCY_ENCODINGS = ('repr', 'pairs', 'ids')
+
+
+def _check_encoding(encoding, vocabulary):
+    if encoding not in TERM_FREQUENCY_ENCODINGS:
+        raise ValueError(f"Unknown term frequency encoding: {encoding!r}")
+    if encoding == 'ids' and vocabulary is None:
+        raise ValueError("The 'ids' encoding needs a vocabulary")
+
+
+def encode_term_frequencies(term_frequencies, encoding='pairs',
+                            vocabulary=None):
+    """
+        Serialize the term frequencies of a row for a CSV field.
+
+        The 'repr' encoding is the dictionary as written by `write_to_csv`,
+        e.g. "{'hello': 2, 'world': 1}". The 'pairs' encoding is shorter and
+        faster to parse back, "hello:2 world:1", and the 'ids' encoding
+        replaces each word by its ID in a `Vocabulary`, "0:2 1:1". Words
+        never contain ':' or spaces, since they are made of word characters
+        (see `get_term_frequencies`).
+
+        Args:
+            term_frequencies (dict): The frequency of each word.
+            encoding (str): One of `TERM_FREQUENCY_ENCODINGS`.
+            vocabulary (Vocabulary): The IDs of the words for the 'ids'
+                                     encoding. New words are added to it.
+
+        Returns:
+            str: The encoded term frequencies.
+    """
+    _check_encoding(encoding, vocabulary)
+    if term_frequencies is None:
+        return ''
+    if encoding == 'repr':
+        return str(term_frequencies)
+    if encoding == 'pairs':
+        return ' '.join([f'{word}:{count}'
+                         for word, count in term_frequencies.items()])
+    add = vocabulary.add
+    return ' '.join([f'{add(word)}:{count}'
+                     for word, count in term_frequencies.items()])
+
+
+def decode_term_frequencies(value, encoding='pairs', vocabulary=None):
+    """
+        Parse the term frequencies written by `encode_term_frequencies`.
+
+        Args:
+            value (str): The encoded term frequencies.
+            encoding (str): One of `TERM_FREQUENCY_ENCODINGS`.
+            vocabulary (Vocabulary): The vocabulary used for the 'ids'
+                                     encoding.
+
+        Returns:
+            dict: The frequency of each word.
+    """
+    _check_encoding(encoding, vocabulary)
+    if not value:
+        return {}
+    if encoding == 'repr':
+        return ast.literal_eval(value)
+    fields = iter(value.replace(':', ' ').split())
+    if encoding == 'pairs':
+        return {word: int(count) for word, count in zip(fields, fields)}
+    words = vocabulary.words
+    return {words[int(word_id)]: int(count)
+            for word_id, count in zip(fields, fields)}
+
+
+@contextmanager
+def _open_output(file, append, compress, buffer_size):
+    mode = 'ab' if append else 'wb'
+    if compress:
+        # Appending to a gzip file adds a new member, which readers
+        # decompress as the continuation of the previous ones
+        binary_file = gzip.GzipFile(file, mode, compresslevel=6)
+    else:
+        binary_file = open(file, mode)
+    with binary_file, io.BufferedWriter(binary_file, buffer_size) as buffer, \
+            io.TextIOWrapper(buffer, encoding='utf-8', newline='') as text:
+        yield text
+
+
+@instrumented
+def stream_to_csv(rows, output_file='data/twitter_processed.csv',
+                  tf_col='term_frequency', encoding='pairs', vocabulary=None,
+                  append=False, compress=None, buffer_size=1 << 20):
+    """
+        Write rows to a CSV file as they are produced, without holding the
+        dataset in memory, through a large output buffer.
+
+        The columns are the keys of the first row, and the term frequency
+        column is serialized with `encode_term_frequencies`. Use
+        `iter_processed_data` to read the file back.
+
+        Args:
+            rows (iterable): The rows to write, e.g. a generator.
+            output_file (str): Path to the output CSV file.
+            tf_col (str): The name of the term frequency column.
+            encoding (str): The encoding of the term frequency column, one of
+                            `TERM_FREQUENCY_ENCODINGS`.
+            vocabulary (Vocabulary): The IDs of the words for the 'ids'
+                                     encoding. New words are added to it, so
+                                     it has to be saved with
+                                     `Vocabulary.save` to read the file.
+            append (bool): Whether to append the rows to an existing file
+                           without writing the header again.
+            compress (bool): Whether to write a gzip file. By default the
+                             file is compressed if its name ends in '.gz'.
+            buffer_size (int): Size in bytes of the output buffer.
+
+        Returns:
+            int: The number of rows written.
+    """
+    _check_encoding(encoding, vocabulary)
+    if compress is None:
+        compress = output_file.lower().endswith('.gz')
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        if not append:
+            # The columns are unknown, but the previous content is removed
+            with _open_output(output_file, append, compress, buffer_size):
+                pass
+        return 0
+    headers = list(first.keys())
+    tf_index = headers.index(tf_col) if tf_col in headers else None
+
+    num_rows = 0
+    with _open_output(output_file, append, compress, buffer_size) as file:
+        writer = csv.writer(file)
+        if not append:
+            writer.writerow(headers)
+        for row in chain((first,), rows):
+            record = [row[col] for col in headers]
+            if tf_index is not None:
+                record[tf_index] = encode_term_frequencies(
+                    record[tf_index], encoding, vocabulary)
+            writer.writerow(record)
+            num_rows += 1
+    return num_rows
+
+
+def iter_processed_data(file='data/twitter_processed.csv',
+                        tf_col='term_frequency', encoding='pairs',
+                        vocabulary=None, chunk_size=10000):
+    """
+        Read a file written by `stream_to_csv` lazily, in bounded batches of
+        rows, parsing the term frequency column back into dictionaries.
+
+        Args:
+            file (str): Path to the CSV file, plain or compressed (see
+                        `open_csv`).
+            tf_col (str): The name of the term frequency column.
+            encoding (str): The encoding of the term frequency column, one of
+                            `TERM_FREQUENCY_ENCODINGS`.
+            vocabulary (Vocabulary): The vocabulary used for the 'ids'
+                                     encoding.
+            chunk_size (int): Maximum number of rows per batch.
+
+        Yields:
+            list: A list of at most `chunk_size` dictionaries.
+    """
+    _check_encoding(encoding, vocabulary)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    decode = partial(decode_term_frequencies, encoding=encoding,
+                     vocabulary=vocabulary)
+    with open_csv(file) as file:
+        reader = csv.reader(file)
+        headers = next(reader, [])
+        tf_index = headers.index(tf_col) if tf_col in headers else None
+        batch = []
+        for record in reader:
+            # Blank lines are skipped, as with csv.DictReader
+            if not record:
+                continue
+            if tf_index is not None:
+                record[tf_index] = decode(record[tf_index])
+            batch.append(dict(zip(headers, record)))
+            if len(batch) == chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _parquet_fallback_file(file):
+    """
+        The gzip CSV file written instead of a Parquet file when pyarrow is
+        not installed.
+    """
+    return os.path.splitext(file)[0] + '.csv.gz'
+
+
+def _parquet_schema(rows, tf_col):
+    """
+        The Arrow schema of some rows. The term frequency column is a map
+        from words to counts, and the types of the other columns are
+        inferred from their values, e.g. the integer counts added by
+        `deduplicate`. Columns without any value are strings.
+    """
+    fields = []
+    for col in (rows[0].keys() if rows else ()):
+        if col == tf_col:
+            field_type = pa.map_(pa.string(), pa.int32())
+        else:
+            field_type = pa.array([row[col] for row in rows]).type
+            if pa.types.is_null(field_type):
+                field_type = pa.string()
+        fields.append((col, field_type))
+    return pa.schema(fields)
+
+
+@instrumented
+def write_parquet(rows, output_file='data/twitter_processed.parquet',
+                  tf_col='term_frequency', row_group_size=100000,
+                  compression='snappy', schema=None):
+    """
+        Write rows to a Parquet file as they are produced, one row group of
+        at most `row_group_size` rows at a time, so only one row group is
+        held in memory. The term frequency column is stored as a map from
+        words to counts, and the types of the other columns are inferred
+        from the first row group unless a schema is given.
+
+        Parquet support needs the optional pyarrow package. Without it, a
+        warning is issued and the rows are written with `stream_to_csv`
+        to a gzip CSV file with the same name and the '.csv.gz' extension,
+        which `iter_parquet` reads back in the same way.
+
+        Args:
+            rows (iterable): The rows to write, e.g. a generator.
+            output_file (str): Path to the output Parquet file.
+            tf_col (str): The name of the term frequency column.
+            row_group_size (int): Maximum number of rows per row group.
+            compression (str): The Parquet compression codec.
+            schema (pyarrow.Schema): The schema of the file, e.g. when a
+                                     column has no value in the first row
+                                     group but is not a string column.
+
+        Returns:
+            int: The number of rows written.
+    """
+    if row_group_size < 1:
+        raise ValueError("row_group_size must be a positive integer")
+    if pq is None:
+        fallback_file = _parquet_fallback_file(output_file)
+        warnings.warn(f"pyarrow is not installed, writing {fallback_file} "
+                      f"instead of {output_file}")
+        return stream_to_csv(rows, fallback_file, tf_col=tf_col)
+
+    rows = iter(rows)
+    group = list(islice(rows, row_group_size))
+    if schema is None:
+        schema = _parquet_schema(group, tf_col)
+
+    # Without any row the file is still replaced, with no row group
+    num_rows = 0
+    with pq.ParquetWriter(output_file, schema,
+                          compression=compression) as writer:
+        while group:
+            writer.write_table(pa.Table.from_pylist(group, schema))
+            num_rows += len(group)
+            group = list(islice(rows, row_group_size))
+    return num_rows
+
+
+def _map_to_dicts(column):
+    """
+        Convert an Arrow map column to dictionaries, slicing the flat keys
+        and values once instead of converting each map to a list of pairs.
+    """
+    offsets = column.offsets.to_pylist()
+    keys = column.keys.to_pylist()
+    items = column.items.to_pylist()
+    dicts = [dict(zip(keys[start:end], items[start:end]))
+             for start, end in zip(offsets, offsets[1:])]
+    if column.null_count:
+        for i, valid in enumerate(column.is_valid().to_pylist()):
+            if not valid:
+                dicts[i] = None
+    return dicts
+
+
+def iter_parquet(file='data/twitter_processed.parquet', columns=None,
+                 tf_col='term_frequency', chunk_size=10000):
+    """
+        Read a file written by `write_parquet` lazily, in bounded batches of
+        rows. Only the requested columns are read from the file, so loading
+        e.g. the sentiment and the text skips the term frequencies.
+
+        Args:
+            file (str): Path to the Parquet file.
+            columns (list): The columns to read, or None to read them all.
+            tf_col (str): The name of the term frequency column.
+            chunk_size (int): Maximum number of rows per batch.
+
+        Yields:
+            list: A list of at most `chunk_size` dictionaries, with the term
+                  frequencies as dictionaries.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if pq is None:
+        fallback_file = _parquet_fallback_file(file)
+        warnings.warn(f"pyarrow is not installed, reading {fallback_file} "
+                      f"instead of {file}")
+        for batch in iter_processed_data(fallback_file, tf_col=tf_col,
+                                         chunk_size=chunk_size):
+            if columns is not None:
+                batch = [{col: data[col] for col in columns}
+                         for data in batch]
+            yield batch
+        return
+
+    parquet_file = pq.ParquetFile(file)
+    for record_batch in parquet_file.iter_batches(batch_size=chunk_size,
+                                                  columns=columns):
+        names = record_batch.schema.names
+        values = [_map_to_dicts(column) if name == tf_col
+                  else column.to_pylist()
+                  for name, column in zip(names, record_batch.columns)]
+        yield [dict(zip(names, row)) for row in zip(*values)]
+
+
+@instrumented
+def find_num_clusters(dataset, col_name='sentiment'):
+    """
+        Find the number of clusters in a dataset based on a specified column.
+
+        Args:
+            dataset (list): The dataset to analyze.
+            col_name (str): The name of the column containing the cluster
+                            information.
+
+    """
+    sentiment_values = set(data[col_name] for data in dataset)
+    num_clusters = len(sentiment_values)
+    print(f"\nThe dataset has {num_clusters} clusters in "
+          f"the {col_name} column.")
+
+
+@instrumented
+def find_empty_percentage(dataset, text_col='text'):
+    """
+        Find the percentage of empty elements in a specific column of
+        a dataset.
+
+        Args:
+            dataset (iterable): The dataset to analyze. Any iterable of rows
+                                is accepted, so the check can run over a
+                                stream of rows.
+            text_col (str): The name of the column to check for empty elements.
+
+    """
+
+    empty = 0
+    total = 0
+
+    for data in dataset:
+        total += 1
+        if not data[text_col]:
+            empty += 1
+
+    if empty > 0:
+        print(f"\nThere are empty elements in the {text_col}")
+        empty_percentage = (empty / total) * 100
+        print(f"The percentage of empty elements in the {text_col} "
+              f"column is: {empty_percentage:.2f}%")
+
+    else:
+        print(f"There are no empty elements in the {text_col}")
+
+
+@instrumented
+def eliminate_null_elements(dataset, text_col='text'):
+    """
+        Eliminate records with null or empty values in a specific column from
+        a dataset.
+
+        Args:
+            dataset (list): The dataset to process.
+            text_col (str): The name of the column to check for null or empty
+            values.
+
+        Returns:
+            list: The updated dataset with null or empty records removed. A
+                  `ColumnarDataset` gives a new `ColumnarDataset`.
+    """
+
+    if isinstance(dataset, ColumnarDataset):
+        return dataset.select(i for i, text in
+                              enumerate(dataset.columns[text_col]) if text)
+
+    dataset = [data for data in dataset if data[text_col]]
+    return dataset
+
+
+# Prime modulus of the MinHash permutations, 2**61 - 1
+MINHASH_PRIME = (1 << 61) - 1
+
+
+def minhash_signatures(matrix, num_perm=128, seed=0, chunk_size=10000):
+    """
+        Get the MinHash signature of each row of a term matrix, taking the
+        row as the set of its words. The fraction of equal values in the
+        signatures of two rows estimates the Jaccard similarity of their
+        sets of words.
+
+        Each word is hashed with CRC-32, so signatures computed with the same
+        `num_perm` and `seed` can be compared across matrices, and each of
+        the `num_perm` permutations is a random hash (a * x + b) mod
+        `MINHASH_PRIME`. The rows are processed in chunks: the permuted
+        hashes are computed for the distinct words of the chunk and the
+        minimum of each row is taken with NumPy, so the memory used depends
+        on the chunk size rather than on the size of the vocabulary.
+
+        Args:
+            matrix (TermMatrix): The term matrix of the dataset (see
+                                 `get_term_matrix`).
+            num_perm (int): Number of permutations, i.e. length of the
+                            signatures.
+            seed (int): Seed of the random permutations.
+            chunk_size (int): Number of rows processed at a time. The
+                              memory used grows with the number of words in
+                              a chunk times `num_perm`.
+
+        Returns:
+            numpy.ndarray: A (rows, num_perm) array of uint32 signatures. The
+                           signature of an empty row has every value set to
+                           the maximum.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    word_hashes = np.fromiter(
+        (zlib.crc32(word.encode('utf-8')) for word in matrix.vocabulary.words),
+        dtype=np.uint64, count=len(matrix.vocabulary))
+
+    indptr, indices = matrix.indptr, matrix.indices
+    signatures = np.full((len(matrix), num_perm), np.iinfo(np.uint32).max,
+                         dtype=np.uint32)
+    for start in range(0, len(matrix), chunk_size):
+        end = min(start + chunk_size, len(matrix))
+        bounds = indptr[start:end + 1] - indptr[start]
+        rows = np.flatnonzero(bounds[1:] > bounds[:-1])
+        if len(rows):
+            word_ids, positions = np.unique(
+                indices[indptr[start]:indptr[end]], return_inverse=True)
+            # The products wrap around 2**64, which still mixes the bits
+            permuted = np.multiply.outer(word_hashes[word_ids], a)
+            permuted += b
+            permuted %= np.uint64(MINHASH_PRIME)
+            permuted &= np.uint64(0xFFFFFFFF)
+            values = permuted.astype(np.uint32)[positions]
+            del permuted
+            signatures[start + rows] = np.minimum.reduceat(
+                values, bounds[rows], axis=0)
+    return signatures
+
+
+def _lsh_bands(num_perm, threshold):
+    """
+        Choose the number of bands of an LSH index, among the divisors of
+        `num_perm`, so the similarity at which two rows become candidates,
+        about (1 / bands) ** (1 / rows), is the highest one not above
+        `threshold`. The candidates are verified afterwards, so a lower
+        similarity only costs more comparisons.
+    """
+    divisors = [bands for bands in range(1, num_perm + 1)
+                if num_perm % bands == 0]
+    below = [bands for bands in divisors
+             if (1 / bands) ** (bands / num_perm) <= threshold]
+    if not below:
+        return num_perm
+    return min(below, key=lambda bands: threshold
+               - (1 / bands) ** (bands / num_perm))
+
+
+def find_near_duplicates(signatures, threshold=0.8, bands=None,
+                         chunk_size=10000):
+    """
+        Find the groups of near-duplicate rows from their MinHash signatures
+        with an LSH index, in time roughly linear in the number of rows.
+
+        The signatures are split in bands, and the rows with an identical
+        band are candidates. Each candidate is compared with the first row
+        of its bucket, and they are grouped when the estimated Jaccard
+        similarity of their words is at least `threshold`.
+
+        Args:
+            signatures (numpy.ndarray): The signatures of the rows (see
+                                        `minhash_signatures`).
+            threshold (float): The minimum estimated Jaccard similarity of
+                               two near-duplicates.
+            bands (int): Number of bands of the index, which must divide the
+                         length of the signatures. By default, it is chosen
+                         from `threshold`.
+            chunk_size (int): Number of candidates compared at a time, which
+                              bounds the memory used.
+
+        Returns:
+            numpy.ndarray: The index of the first row of the group of each
+                           row, which is the row itself if it has no earlier
+                           near-duplicate. Empty rows are never duplicates.
+    """
+    num_rows, num_perm = signatures.shape
+    if bands is None:
+        bands = _lsh_bands(num_perm, threshold)
+    if num_perm % bands:
+        raise ValueError("bands must divide the length of the signatures")
+    rows_per_band = num_perm // bands
+
+    parents = list(range(num_rows))
+
+    def find(row):
+        root = row
+        while parents[root] != root:
+            root = parents[root]
+        while parents[row] != root:
+            parents[row], row = root, parents[row]
+        return root
+
+    empty = np.all(signatures == np.iinfo(signatures.dtype).max, axis=1)
+    candidates = np.flatnonzero(~empty)
+    for band in range(bands):
+        columns = slice(band * rows_per_band, (band + 1) * rows_per_band)
+        keys = np.ascontiguousarray(signatures[candidates, columns])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize
+                                   * rows_per_band))).ravel()
+        _, first, bucket = np.unique(keys, return_index=True,
+                                     return_inverse=True)
+        # Compare each row with the first row of its bucket
+        rows = candidates
+        firsts = candidates[first[bucket.ravel()]]
+        pairs = rows != firsts
+        rows, firsts = rows[pairs], firsts[pairs]
+        for start in range(0, len(rows), chunk_size):
+            chunk_rows = rows[start:start + chunk_size]
+            chunk_firsts = firsts[start:start + chunk_size]
+            similar = (signatures[chunk_rows] == signatures[chunk_firsts]
+                       ).mean(axis=1) >= threshold
+            for row, other in zip(chunk_rows[similar].tolist(),
+                                  chunk_firsts[similar].tolist()):
+                root, other_root = find(row), find(other)
+                if root != other_root:
+                    # The root of a group is always its first row
+                    parents[max(root, other_root)] = min(root, other_root)
+
+    return np.array([find(row) for row in range(num_rows)], dtype=np.int64)
+
+
+# What `deduplicate` does with the near-duplicates
+DEDUPLICATION_MODES = ('drop', 'collapse', 'flag')
+
+
+@instrumented
+def deduplicate(dataset, text_col='text', mode='drop', threshold=0.8,
+                num_perm=128, seed=0, col_name=None):
+    """
+        Find the near-duplicate tweets of the dataset, e.g. slightly edited
+        spam, with MinHash signatures and an LSH index (see
+        `find_near_duplicates`), and drop, collapse or flag them. It is meant
+        to run after `preprocess_text`, so the texts are compared by their
+        cleaned words.
+
+        Args:
+            dataset (list): The dataset to process.
+            text_col (str): The name of the column containing the text data.
+            mode (str): 'drop' keeps only the first tweet of each group of
+                        near-duplicates. 'collapse' also adds the size of the
+                        group to each tweet kept, in the 'duplicate_count'
+                        column. 'flag' keeps every tweet and adds the index
+                        of the first tweet of its group to the duplicates,
+                        in the 'duplicate_of' column, which is None for the
+                        other tweets.
+            threshold (float): The minimum estimated Jaccard similarity of
+                               the words of two near-duplicates.
+            num_perm (int): Length of the MinHash signatures.
+            seed (int): Seed of the MinHash permutations.
+            col_name (str): The name of the column added by 'collapse' and
+                            'flag', instead of the default one.
+
+        Returns:
+            list: The dataset without the near-duplicates for 'drop' and
+                  'collapse', or the same dataset for 'flag'. A
+                  `ColumnarDataset` gives a `ColumnarDataset`.
+    """
+    if mode not in DEDUPLICATION_MODES:
+        raise ValueError(f"Unknown deduplication mode: {mode!r}")
+
+    signatures = minhash_signatures(get_term_matrix(dataset, text_col),
+                                    num_perm, seed)
+    groups = find_near_duplicates(signatures, threshold)
+    originals = np.flatnonzero(groups == np.arange(len(groups)))
+
+    if mode == 'flag':
+        col_name = col_name or 'duplicate_of'
+        for i, (data, group) in enumerate(zip(dataset, groups.tolist())):
+            data[col_name] = group if group != i else None
+        return dataset
+
+    if isinstance(dataset, ColumnarDataset):
+        unique = dataset.select(originals.tolist())
+    else:
+        unique = [dataset[i] for i in originals.tolist()]
+    if mode == 'collapse':
+        col_name = col_name or 'duplicate_count'
+        counts = np.bincount(groups, minlength=len(groups))[originals]
+        for data, count in zip(unique, counts.tolist()):
+            data[col_name] = count
+    return unique
+
+
+# Figure reused by all the plots rendered in a headless worker process
+_worker_figure = None
+
+
+def _init_render_worker():
+    """
+        Prepare a worker process for headless rendering: switch to the
+        non-interactive Agg backend and create the figure it will reuse.
+    """
+    global _worker_figure
+    plt.switch_backend('Agg')
+    _worker_figure = plt.figure()
+
+
+def _render_word_cloud(item, output_dir):
+    """
+        Render the word cloud of a cluster to a PNG file in a worker process.
+
+        Args:
+            item (tuple): The cluster and its word-frequency pairs.
+            output_dir (str): The directory to save the word cloud.
+
+        Returns:
+            str: Path to the saved word cloud.
+    """
+    cluster, word_freq = item
+    output_file = os.path.join(output_dir, 'cluster_{}.png'.format(cluster))
+    WordCloud().generate_from_frequencies(word_freq).to_file(output_file)
+    return output_file
+
+
+def _render_histogram(item, output_dir, top_count=20):
+    """
+        Render the histogram of a cluster to a PNG file in a worker process,
+        reusing the figure of the worker.
+
+        Args:
+            item (tuple): The cluster and its top (word, count) pairs.
+            output_dir (str): The directory to save the histogram.
+            top_count (int): The number of top words, for the title.
+
+        Returns:
+            str: Path to the saved histogram.
+    """
+    cluster, top_words = item
+    words, counts = zip(*top_words)
+
+    _worker_figure.clf()
+    axes = _worker_figure.add_subplot()
+    axes.bar(words, counts)
+    axes.set_xlabel('Words')
+    axes.set_ylabel('Frequency')
+    axes.set_title(f'Top {top_count} Words - Cluster {cluster}')
+    axes.tick_params(axis='x', labelrotation=90)
+
+    output_file = f'{output_dir}/histogram_cluster{cluster}.png'
+    _worker_figure.savefig(output_file)
+    return output_file
+
+
+def _render_in_parallel(render, items, output_dir, workers, description):
+    """
+        Render one plot per cluster in a pool of headless worker processes.
+
+        Args:
+            render (callable): The module-level function rendering a plot.
+            items (iterable): The (cluster, data) pairs to render.
+            output_dir (str): The directory to save the plots.
+            workers (int): Number of worker processes. Defaults to the number
+                           of CPUs.
+            description (str): The kind of plot, for the progress messages.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def announced_items():
+        for cluster, data in items:
+            print(f"\nGenerating {description} for cluster ", cluster)
+            yield cluster, data
+
+    for _ in _map_batches(partial(render, output_dir=output_dir),
+                          announced_items(), workers or os.cpu_count() or 1,
+                          initializer=_init_render_worker):
+        pass
+
+
+def _top_words(frequencies, count):
+    """
+        Get the most frequent words of a word-frequency mapping, without
+        copying it.
+
+        Args:
+            frequencies (dict): The word-frequency pairs.
+            count (int): Number of words to get.
+
+        Returns:
+            list: The (word, frequency) pairs, from the most frequent.
+    """
+    if hasattr(frequencies, 'most_common'):
+        return frequencies.most_common(count)
+    return heapq.nlargest(count, frequencies.items(), key=itemgetter(1))
+
+
+@instrumented
+def generate_word_clouds_from_frequencies(term_frequencies,
+                                          output_dir='word_cloud_plots',
+                                          top_count=200, headless=False,
+                                          workers=None):
+    """
+        Generate word clouds for each cluster from term frequencies, e.g. the
+        ones returned by `get_cluster_term_frequencies`.
+
+        Args:
+            term_frequencies (dict): A nested dictionary containing the term
+                                     frequencies for each cluster. The outer
+                                     dictionary's keys are the clusters, and
+                                     the inner dictionary contains
+                                     word-frequency pairs for each cluster.
+            output_dir (str): The directory to save the generated word cloud
+                              plots.
+            top_count (int): Number of most frequent words passed to the word
+                             cloud, or None to pass all of them. The default
+                             matches the number of words a word cloud draws,
+                             so pruning does not change the plots.
+            headless (bool): Whether to only save the word clouds, rendering
+                             them in a pool of processes with a
+                             non-interactive backend, instead of displaying
+                             them.
+            workers (int): Number of worker processes in headless mode.
+                           Defaults to the number of CPUs.
+    """
+
+    def cluster_frequencies():
+        for cluster, frequencies in term_frequencies.items():
+            if top_count is not None:
+                frequencies = dict(_top_words(frequencies, top_count))
+            yield cluster, frequencies
+
+    if headless:
+        _render_in_parallel(_render_word_cloud, cluster_frequencies(),
+                            output_dir, workers, 'word cloud')
+        return
+
+    # generate word cloud for each cluster
+    for cluster, word_freq in cluster_frequencies():
+        print("\nGenerating word cloud for cluster ", cluster)
+
+        # generate word cloud
+        wordcloud = WordCloud().generate_from_frequencies(word_freq)
+
+        # save word cloud plot
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         output_file = os.path.join(output_dir, 'cluster_{}.png'.format(
@@ -342,8 +2689,367 @@ def generate_word_clouds_for_clusters(dataset, cluster_col='sentiment',
         plt.show()
 
 
+@instrumented
+def generate_word_clouds_for_clusters(dataset, cluster_col='sentiment',
+                                      text_col='text',
+                                      output_dir='word_cloud_plots',
+                                      headless=False, workers=None):
+    """
+        Generate word clouds for each cluster in a dataset based on a
+        specified column.
+
+        The text of each cluster is tokenized with NLTK. When the cluster
+        term frequencies are already available, it is much faster to use
+        `generate_word_clouds_from_frequencies` instead.
+
+        Args:
+            dataset (list): The dataset containing the records.
+            cluster_col (str): The name of the column representing the
+                               clusters.
+            text_col (str): The name of the column containing the text data.
+            output_dir (str): The directory to save the generated word cloud
+                              plots.
+            headless (bool): Whether to only save the word clouds, rendering
+                             them in a pool of processes with a
+                             non-interactive backend, instead of displaying
+                             them.
+            workers (int): Number of worker processes in headless mode.
+                           Defaults to the number of CPUs.
+
+    """
+    cluster_data = {}
+
+    # group records by cluster
+    for data in dataset:
+        cluster = data[cluster_col]
+        text = data[text_col]
+        if cluster in cluster_data:
+            cluster_data[cluster].append(text)
+        else:
+            cluster_data[cluster] = [text]
+
+    # create word frequency dictionary of each cluster, releasing the text of
+    # each cluster once it has been counted
+    term_frequencies = {}
+    for cluster in list(cluster_data):
+        combined_text = ' '.join(cluster_data.pop(cluster))
+        term_frequencies[cluster] = nltk.FreqDist(
+                                    nltk.word_tokenize(combined_text))
+
+    generate_word_clouds_from_frequencies(term_frequencies, output_dir,
+                                          top_count=None, headless=headless,
+                                          workers=workers)
+
+
+class SpaceSaving(Mapping):
+    """
+        Approximate counts of the most frequent words in a stream, using at
+        most `capacity` counters (Space-Saving algorithm).
+
+        When a new word arrives and all the counters are in use, the word
+        with the smallest count is replaced and the new word inherits its
+        count. Any word with a true count above `total / capacity` is
+        guaranteed to be kept, and its count is overestimated by at most the
+        error recorded for it.
+
+        It behaves as a read-only dictionary of word-frequency pairs and has
+        the `update` and `most_common` methods of `Counter`.
+
+        Attributes:
+            capacity (int): The maximum number of words kept.
+            counts (dict): The estimated count of each word kept.
+            errors (dict): The maximum overestimation of each count.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be a positive integer")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # (count, word) entries, one per word kept. A count may be lower than
+        # the current one, and it is corrected when it reaches the top.
+        self._heap = []
+
+    def __getitem__(self, word):
+        return self.counts[word]
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, word, count=1):
+        """
+            Add occurrences of a word.
+
+            Args:
+                word (str): The word to add.
+                count (int): Number of occurrences.
+        """
+        counts = self.counts
+        if word in counts:
+            counts[word] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[word] = count
+            self.errors[word] = 0
+            heapq.heappush(self._heap, (count, word))
+            return
+
+        # Find the word with the smallest count, fixing outdated entries
+        heap = self._heap
+        min_count, min_word = heap[0]
+        while counts[min_word] != min_count:
+            heapq.heapreplace(heap, (counts[min_word], min_word))
+            min_count, min_word = heap[0]
+
+        del counts[min_word]
+        del self.errors[min_word]
+        counts[word] = min_count + count
+        self.errors[word] = min_count
+        heapq.heapreplace(heap, (min_count + count, word))
+
+    def update(self, words):
+        """
+            Add the occurrences of several words.
+
+            Args:
+                words (iterable or dict): The words to add, or a dictionary of
+                                          word-frequency pairs.
+        """
+        if not isinstance(words, Mapping):
+            words = Counter(words)
+        for word, count in words.items():
+            self.add(word, count)
+
+    def _min_count(self):
+        """
+            The largest count that a word not kept may have, which is the
+            smallest count kept once all the counters are in use.
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """
+            Add the counts of another sketch, keeping the error bounds valid
+            (mergeable Space-Saving). A word that one of the sketches does
+            not keep may have occurred there as often as its smallest count,
+            so that count is added to its estimate and its error.
+
+            Args:
+                other (SpaceSaving or dict): The sketch to merge, or exact
+                                             word-frequency pairs.
+
+            Returns:
+                SpaceSaving: The sketch itself.
+        """
+        if isinstance(other, SpaceSaving):
+            other_errors, other_min = other.errors, other._min_count()
+        else:
+            other_errors, other_min = {}, 0
+        own_min = self._min_count()
+
+        counts = {}
+        errors = {}
+        for word in chain(self.counts, (word for word in other
+                                        if word not in self.counts)):
+            own_count = self.counts.get(word)
+            other_count = other.get(word)
+            counts[word] = (own_min if own_count is None else own_count) + \
+                (other_min if other_count is None else other_count)
+            errors[word] = (
+                (own_min if own_count is None else self.errors[word]) +
+                (other_min if other_count is None
+                 else other_errors.get(word, 0)))
+
+        self._keep_top(counts, errors)
+        return self
+
+    def _keep_top(self, counts, errors):
+        """
+            Replace the state of the sketch with the `capacity` words with
+            the highest counts.
+        """
+        top = heapq.nlargest(self.capacity, counts.items(),
+                             key=itemgetter(1))
+        self.counts = dict(top)
+        self.errors = {word: errors.get(word, 0) for word in self.counts}
+        self._heap = [(count, word) for word, count in top]
+        heapq.heapify(self._heap)
+
+    @classmethod
+    def from_counts(cls, capacity, counts, errors=None):
+        """
+            Rebuild a sketch from its estimated counts and their errors,
+            e.g. as saved by `TermFrequencyAggregator.save`.
+
+            Args:
+                capacity (int): The maximum number of words kept. Only the
+                                words with the highest counts are kept.
+                counts (dict): The estimated count of each word.
+                errors (dict): The maximum overestimation of each count.
+                               Counts without an error are exact.
+
+            Returns:
+                SpaceSaving: The sketch.
+        """
+        sketch = cls(capacity)
+        sketch._keep_top(counts, errors or {})
+        return sketch
+
+    def most_common(self, n=None):
+        """
+            Get the words with the highest estimated counts.
+
+            Args:
+                n (int): Number of words. All the words kept if None.
+
+            Returns:
+                list: The (word, count) pairs, from the most common.
+        """
+        if n is None:
+            return sorted(self.counts.items(), key=itemgetter(1),
+                          reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+
+class TermFrequencyAggregator:
+    """
+        Term frequencies for each cluster that can be updated with new
+        batches of records, merged with other aggregators (e.g. the ones
+        built by parallel workers) and saved to disk, so that new data can be
+        added without recounting the whole history.
+
+        With `max_terms`, each cluster only keeps the approximate counts of
+        its `max_terms` most frequent words (see `SpaceSaving`), so memory is
+        bounded whatever the size of the vocabulary.
+
+        Attributes:
+            term_frequencies (dict): A dictionary with a `Counter` (or a
+                                     `SpaceSaving` with `max_terms`) of
+                                     word-frequency pairs for each cluster.
+            max_terms (int): Maximum number of words kept per cluster, or None
+                             to keep exact counts of every word.
+    """
+
+    def __init__(self, max_terms=None):
+        self.max_terms = max_terms
+        if max_terms is None:
+            self.term_frequencies = defaultdict(Counter)
+        else:
+            self.term_frequencies = defaultdict(partial(SpaceSaving,
+                                                        max_terms))
+
+    def update(self, dataset, text_col='text', cluster_col='sentiment'):
+        """
+            Add the words of a batch of records to the term frequencies.
+
+            Args:
+                dataset (iterable): The records to add.
+                text_col (str): The name of the column containing the text
+                                data.
+                cluster_col (str): The name of the column representing the
+                                   clusters.
+
+            Returns:
+                TermFrequencyAggregator: The aggregator itself.
+        """
+        term_frequencies = self.term_frequencies
+        for data in dataset:
+            term_frequencies[data[cluster_col]].update(
+                WORD_PATTERN.findall(data[text_col]))
+        return self
+
+    def merge(self, other):
+        """
+            Add the term frequencies of another aggregator to this one.
+
+            Args:
+                other (TermFrequencyAggregator): The aggregator to merge.
+
+            Returns:
+                TermFrequencyAggregator: The aggregator itself.
+        """
+        for cluster, frequencies in other.term_frequencies.items():
+            own = self.term_frequencies[cluster]
+            if isinstance(own, SpaceSaving):
+                own.merge(frequencies)
+            else:
+                own.update(frequencies)
+        return self
+
+    def to_dict(self):
+        """
+            Returns:
+                dict: The term frequencies as a nested dictionary of plain
+                      dictionaries.
+        """
+        return {cluster: dict(frequencies)
+                for cluster, frequencies in self.term_frequencies.items()}
+
+    def save(self, file):
+        """
+            Save the term frequencies to a JSON file. The file is replaced
+            atomically, so a failed save keeps the previous version. With
+            `max_terms`, the error of each approximate count is saved too,
+            so the loaded counts keep their guarantees.
+
+            Args:
+                file (str): Path to the output file.
+        """
+        state = {'max_terms': self.max_terms,
+                 'term_frequencies': self.to_dict()}
+        if self.max_terms is not None:
+            state['errors'] = {cluster: dict(frequencies.errors)
+                               for cluster, frequencies in
+                               self.term_frequencies.items()}
+        tmp_file = f'{file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as output:
+            json.dump(state, output)
+        os.replace(tmp_file, file)
+
+    @classmethod
+    def load(cls, file, max_terms=None):
+        """
+            Load term frequencies saved with `save`.
+
+            Args:
+                file (str): Path to the file.
+                max_terms (int): Maximum number of words kept per cluster, or
+                                 None to keep the setting saved in the file.
+
+            Returns:
+                TermFrequencyAggregator: The loaded aggregator.
+        """
+        with open(file, 'r', encoding='utf-8') as input_file:
+            state = json.load(input_file)
+        if set(state) - {'errors'} != {'max_terms', 'term_frequencies'}:
+            # Files saved with only the term frequencies of each cluster
+            state = {'max_terms': None, 'term_frequencies': state}
+        if max_terms is None:
+            max_terms = state['max_terms']
+
+        aggregator = cls(max_terms)
+        errors = state.get('errors', {})
+        for cluster, frequencies in state['term_frequencies'].items():
+            if max_terms is not None and cluster in errors:
+                aggregator.term_frequencies[cluster] = \
+                    SpaceSaving.from_counts(max_terms, frequencies,
+                                            errors[cluster])
+            else:
+                aggregator.term_frequencies[cluster].update(frequencies)
+        return aggregator
+
+
+@instrumented
 def get_cluster_term_frequencies(dataset, text_col='text',
-                                 cluster_col='sentiment'):
+                                 cluster_col='sentiment', aggregator=None,
+                                 max_terms=None):
     """
         Calculate term frequencies for each word within clusters in a dataset.
 
@@ -352,6 +3058,14 @@ def get_cluster_term_frequencies(dataset, text_col='text',
             text_col (str): The name of the column containing the text data.
             cluster_col (str): The name of the column representing the
                                clusters.
+            aggregator (TermFrequencyAggregator): An aggregator to add the
+                                                  records to, e.g. one loaded
+                                                  from a previous run. A new
+                                                  one is used if None.
+            max_terms (int): Maximum number of words kept per cluster. With
+                             it, only the approximate counts of the most
+                             frequent words are kept (see `SpaceSaving`).
+                             Only used when a new aggregator is created.
 
         Returns:
             dict: A nested dictionary containing the term frequencies for each
@@ -360,22 +3074,663 @@ def get_cluster_term_frequencies(dataset, text_col='text',
                   cluster.
         """
 
-    term_frequencies = defaultdict(dict)
+    if aggregator is None:
+        aggregator = TermFrequencyAggregator(max_terms)
+    elif max_terms is not None:
+        raise ValueError("max_terms cannot be used with an existing "
+                         "aggregator")
+    aggregator.update(dataset, text_col, cluster_col)
 
-    for data in dataset:
-        cluster = data[cluster_col]
-        tweet = data[text_col]
+    return aggregator.term_frequencies
 
-        words = re.findall(r'\b\w+\b', tweet)
-        for word in words:
-            term_frequencies[cluster][word] = term_frequencies[
-                                              cluster].get(word, 0) + 1
 
-    return term_frequencies
+def _count_cluster_terms(texts, labels, stopwords=STOPWORDS, cache=None):
+    """
+        Preprocess a batch of texts, remove the stopwords and count the words
+        of each cluster in a worker.
+
+        Args:
+            texts (list): The texts of the batch.
+            labels (list): The cluster of each text.
+            stopwords (str or set): The stopwords to remove.
+            cache (CleaningCache): A cache shared by the threads of the
+                                   executor. By default the cache of the
+                                   worker process is used, if there is one.
+
+        Returns:
+            tuple: The term frequencies of the batch as a
+                   `TermFrequencyAggregator`, and the counts of the worker
+                   process cache or None.
+    """
+    batch = [{'text': text, 'cluster': label}
+             for text, label in zip(texts, labels)]
+    process_dataset(batch, term_frequencies=False, vocabulary=False,
+                    stopwords=stopwords,
+                    cache=cache if cache is not None else _worker_cache)
+    counts = _take_worker_counts() if cache is None else None
+    return TermFrequencyAggregator().update(batch, 'text', 'cluster'), counts
+
+
+async def _read_shard(file, queue, chunk_size, open_files):
+    """
+        Put the batches of a CSV shard in the queue. The file is read in a
+        thread so that the event loop keeps running, and the reader waits
+        whenever the queue is full.
+    """
+    async with open_files:
+        batches = iter_data(file, chunk_size)
+        reading = None
+        try:
+            while True:
+                reading = asyncio.ensure_future(
+                    asyncio.to_thread(next, batches, None))
+                batch = await asyncio.shield(reading)
+                if batch is None:
+                    break
+                await queue.put(batch)
+        finally:
+            # A cancelled task does not stop the thread, and the generator
+            # cannot be closed while the thread is running it
+            if reading is not None and not reading.done():
+                await asyncio.wait([reading])
+            batches.close()
+
+
+async def _read_feed(address, queue, chunk_size, flush_interval):
+    """
+        Put the records of a socket feed in the queue. The feed sends one
+        JSON object per line, e.g. {"sentiment": "4", "text": "..."}, and
+        ends when the connection is closed. A partial batch is queued when
+        no record arrives for `flush_interval` seconds.
+    """
+    parts = urlsplit(address)
+    if parts.scheme == 'unix':
+        reader, writer = await asyncio.open_unix_connection(
+            parts.netloc + parts.path)
+    else:
+        # hostname removes the brackets of IPv6 addresses, e.g. [::1]
+        reader, writer = await asyncio.open_connection(parts.hostname,
+                                                       parts.port)
+
+    batch = []
+    try:
+        while True:
+            try:
+                line = await asyncio.wait_for(reader.readline(),
+                                              flush_interval)
+            except asyncio.TimeoutError:
+                if batch:
+                    await queue.put(batch)
+                    batch = []
+                continue
+            if not line:
+                break
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == chunk_size:
+                await queue.put(batch)
+                batch = []
+        if batch:
+            await queue.put(batch)
+    finally:
+        writer.close()
+
+
+async def _consume_batches(queue, aggregator, executor, text_col,
+                           cluster_col, stopwords, counts, cache,
+                           shared_cache):
+    """
+        Take batches from the queue until a None is found and count their
+        words in the executor, merging the results in the aggregator.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            return
+        texts = [data[text_col] or '' for data in batch]
+        labels = [data[cluster_col] for data in batch]
+        result, cache_counts = await loop.run_in_executor(
+            executor, _count_cluster_terms, texts, labels, stopwords,
+            cache if shared_cache else None)
+        aggregator.merge(result)
+        if cache_counts is not None:
+            cache.add_counts(*cache_counts)
+        counts['rows'] += len(batch)
+
+
+async def ingest_async(sources, aggregator=None, text_col='text',
+                       cluster_col='sentiment', workers=None,
+                       chunk_size=1000, max_queued=None, max_open_files=8,
+                       flush_interval=1.0, stopwords=STOPWORDS,
+                       executor=None, cache=None):
+    """
+        Read records from many CSV shards and socket feeds concurrently,
+        preprocess them, remove the stopwords and add their words to the
+        term frequencies of each cluster.
+
+        The sources are read in batches of `chunk_size` records and put in a
+        queue of at most `max_queued` batches. The batches are processed in
+        a pool of worker processes while the next ones are being read, and
+        the readers wait while the queue is full, so memory stays bounded
+        when the sources are faster than the processing.
+
+        Args:
+            sources (list): Paths to CSV files, plain or compressed (see
+                            `open_csv`), and addresses of feeds sending one
+                            JSON record per line, as 'tcp://host:port',
+                            'tcp://[ipv6]:port' or 'unix:///path/to/socket'.
+            aggregator (TermFrequencyAggregator): The aggregator to update.
+                                                  A new one by default.
+            text_col (str): The name of the column containing the text data.
+            cluster_col (str): The name of the column representing the
+                               clusters.
+            workers (int): Number of worker processes. Defaults to the number
+                           of CPUs.
+            chunk_size (int): Maximum number of records per batch.
+            max_queued (int): Maximum number of batches waiting to be
+                              processed. Defaults to twice the workers.
+            max_open_files (int): Maximum number of shards read at once.
+            flush_interval (float): Seconds to wait for a feed record before
+                                    processing a partial batch.
+            stopwords (str or set): The stopwords to remove, or a source to
+                                    load them from (see `load_stopwords`).
+            executor (Executor): The executor of the processing, instead of a
+                                 new pool of `workers` processes.
+            cache (CleaningCache): A cache of the words of repeated texts.
+                                   Each worker process gets an empty cache
+                                   with its size and stopwords, and their
+                                   hits and misses are added to it. With an
+                                   `executor`, which must then use threads,
+                                   the cache itself is shared.
+
+        Returns:
+            TermFrequencyAggregator: The updated aggregator.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if aggregator is None:
+        aggregator = TermFrequencyAggregator()
+    workers = workers or os.cpu_count() or 1
+    stopwords = _resolve_stopwords(stopwords)
+    if cache is not None and cache.stopwords != stopwords:
+        raise ValueError("The cache was built with different stopwords")
+
+    queue = asyncio.Queue(maxsize=max_queued or 2 * workers)
+    open_files = asyncio.Semaphore(max_open_files)
+    own_executor = executor is None
+    if own_executor:
+        # The workers are spawned instead of forked. A forked worker would
+        # inherit the open sockets, so a closed connection would not end its
+        # feed, and could copy a lock held by one of the reading threads
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=None if cache is None else partial(
+                _init_worker_cache, cache.max_size, stopwords))
+
+    with METRICS.stage('ingest') as measures:
+        counts = {'rows': 0}
+        readers = [asyncio.create_task(
+                       _read_feed(source, queue, chunk_size, flush_interval)
+                       if re.match(r'(tcp|unix)://', source) else
+                       _read_shard(source, queue, chunk_size, open_files))
+                   for source in sources]
+        consumers = [asyncio.create_task(_consume_batches(
+                         queue, aggregator, executor, text_col, cluster_col,
+                         stopwords, counts, cache, not own_executor))
+                     for _ in range(workers)]
+
+        async def close_queue():
+            await asyncio.gather(*readers)
+            for _ in consumers:
+                await queue.put(None)
+
+        tasks = readers + consumers + [asyncio.create_task(close_queue())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Stop the other readers and consumers if one of them failed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if own_executor:
+                executor.shutdown(cancel_futures=True)
+        measures['rows'] = counts['rows']
+
+    return aggregator
+
+
+def ingest(sources, **kwargs):
+    """
+        Run `ingest_async` in a new event loop.
+
+        Args:
+            sources (list): The CSV files and socket feeds to read.
+            **kwargs: The other arguments of `ingest_async`.
+
+        Returns:
+            TermFrequencyAggregator: The updated aggregator.
+    """
+    return asyncio.run(ingest_async(sources, **kwargs))
+
+
+def cluster_term_counts(matrix, labels):
+    """
+        Sum the term counts of the rows of each cluster with array
+        operations.
+
+        Args:
+            matrix (TermMatrix): The term counts of the dataset.
+            labels (list): The cluster of each row, e.g. its sentiment.
 
+        Returns:
+            tuple: The list of clusters, in order of first appearance, and a
+                   (clusters, words) array with the count of each word ID in
+                   each cluster.
+    """
+    if len(labels) != len(matrix):
+        raise ValueError("There must be one label per row")
+    clusters = list(dict.fromkeys(labels))
+    cluster_ids = np.fromiter(map({cluster: i for i, cluster
+                                   in enumerate(clusters)}.__getitem__,
+                                  labels),
+                              dtype=np.int64, count=len(labels))
+    num_words = len(matrix.vocabulary)
+    flat = cluster_ids[_row_ids(matrix)] * num_words + matrix.indices
+    counts = np.bincount(flat, weights=matrix.data,
+                         minlength=len(clusters) * num_words)
+    return clusters, counts.reshape(len(clusters), num_words)
+
+
+def term_frequencies_to_counts(term_frequencies):
+    """
+        Convert the term frequencies of each cluster, e.g. the output of
+        `get_cluster_term_frequencies`, to an array.
+
+        Args:
+            term_frequencies (dict): A dictionary with the word-frequency
+                                     pairs of each cluster.
+
+        Returns:
+            tuple: The list of clusters, the `Vocabulary` of the words and a
+                   (clusters, words) array with the count of each word ID in
+                   each cluster.
+    """
+    clusters = list(term_frequencies)
+    vocabulary = Vocabulary()
+    for frequencies in term_frequencies.values():
+        vocabulary.update(frequencies.keys())
+    counts = np.zeros((len(clusters), len(vocabulary)))
+    for i, frequencies in enumerate(term_frequencies.values()):
+        ids = np.fromiter(map(vocabulary.ids.__getitem__, frequencies.keys()),
+                          dtype=np.int64, count=len(frequencies))
+        counts[i, ids] = np.fromiter(frequencies.values(), dtype=np.float64,
+                                     count=len(frequencies))
+    return clusters, vocabulary, counts
+
+
+def weighted_log_odds(counts, prior_scale=1.0):
+    """
+        Score how much each word is associated with each cluster by its
+        log-odds ratio against the other clusters, weighted by an informative
+        Dirichlet prior and divided by its standard deviation (Monroe et al.,
+        "Fightin' words"). Large positive scores mark words characteristic of
+        the cluster, and rare words are not overrated.
+
+        The prior of each word is its frequency in the whole corpus, scaled
+        so that a word of average frequency has `prior_scale` pseudo-counts.
+
+        Args:
+            counts (numpy.ndarray): A (clusters, words) array of term counts
+                                    (see `cluster_term_counts`).
+            prior_scale (float): The strength of the prior.
+
+        Returns:
+            numpy.ndarray: The (clusters, words) array of z-scores. Words that
+                           never appear have a score of 0.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=0)
+    alpha = prior_scale * totals.size * totals / max(totals.sum(), 1.0)
+    alpha0 = alpha.sum()
+
+    cluster_sizes = counts.sum(axis=1, keepdims=True)
+    rest = totals - counts
+    rest_sizes = cluster_sizes.sum() - cluster_sizes
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = (np.log(counts + alpha)
+                 - np.log(cluster_sizes + alpha0 - counts - alpha)
+                 - np.log(rest + alpha)
+                 + np.log(rest_sizes + alpha0 - rest - alpha))
+        variance = 1 / (counts + alpha) + 1 / (rest + alpha)
+        scores = delta / np.sqrt(variance)
+    scores[:, totals == 0] = 0.0
+    return np.nan_to_num(scores)
+
+
+def chi_squared(counts):
+    """
+        Score how much each word is associated with each cluster by the
+        chi-squared statistic of the 2x2 table of the word and the cluster
+        against the other words and clusters. The score is positive when the
+        word is more frequent in the cluster than expected and negative when
+        it is less frequent.
+
+        Args:
+            counts (numpy.ndarray): A (clusters, words) array of term counts
+                                    (see `cluster_term_counts`).
+
+        Returns:
+            numpy.ndarray: The (clusters, words) array of signed chi-squared
+                           statistics.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    word_totals = counts.sum(axis=0)
+    cluster_sizes = counts.sum(axis=1, keepdims=True)
+
+    a = counts
+    b = word_totals - a
+    c = cluster_sizes - a
+    d = total - a - b - c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = total * (a * d - b * c) ** 2 / (
+            (a + b) * (c + d) * (a + c) * (b + d))
+    return np.nan_to_num(np.sign(a * d - b * c) * scores)
+
+
+def top_scored_terms(scores, vocabulary, clusters, count=10):
+    """
+        Get the words with the highest scores in each cluster.
+
+        Args:
+            scores (numpy.ndarray): A (clusters, words) array of scores, e.g.
+                                    from `weighted_log_odds`.
+            vocabulary (Vocabulary): The words of the scores.
+            clusters (list): The clusters of the rows of the scores.
+            count (int): Number of words per cluster.
+
+        Returns:
+            dict: A list of (word, score) pairs for each cluster, from the
+                  highest score.
+    """
+    count = min(count, scores.shape[1])
+    words = vocabulary.words
+    top = {}
+    for cluster, cluster_scores in zip(clusters, scores):
+        if count == 0:
+            top[cluster] = []
+            continue
+        ids = np.argpartition(-cluster_scores, count - 1)[:count]
+        ids = ids[np.argsort(-cluster_scores[ids], kind='stable')]
+        top[cluster] = [(words[i], float(cluster_scores[i]))
+                        for i in ids.tolist()]
+    return top
+
+
+class NaiveBayesClassifier:
+    """
+        Multinomial Naive Bayes classifier of the clusters of the tweets,
+        e.g. their sentiment, from the words of their cleaned text.
+
+        The model only keeps the word counts and the number of tweets of each
+        cluster, so it can be trained from the output of
+        `get_cluster_term_frequencies` or a `TermFrequencyAggregator`,
+        updated incrementally with new batches, saved and loaded, and still
+        be updated afterwards. Tweets are scored in batches with array
+        operations, and words unknown to the model are ignored.
+
+        Attributes:
+            alpha (float): The additive (Laplace) smoothing of the counts.
+            classes (list): The clusters, in order of first appearance.
+            vocabulary (Vocabulary): The words known to the model.
+            term_counts (numpy.ndarray): The (classes, words) word counts.
+            doc_counts (numpy.ndarray): The number of tweets of each class.
+    """
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.classes = []
+        self.vocabulary = Vocabulary()
+        self.term_counts = np.zeros((0, 0))
+        self.doc_counts = np.zeros(0)
+        self._log_probs = None
+
+    def _class_ids(self, labels):
+        """
+            The IDs of some classes, adding the new ones to the model.
+        """
+        ids = {cluster: i for i, cluster in enumerate(self.classes)}
+        for label in labels:
+            if label not in ids:
+                ids[label] = len(self.classes)
+                self.classes.append(label)
+        return ids
+
+    def _resize(self):
+        """
+            Grow the count arrays to the current classes and vocabulary.
+        """
+        rows, columns = self.term_counts.shape
+        self.term_counts = np.pad(self.term_counts,
+                                  ((0, len(self.classes) - rows),
+                                   (0, len(self.vocabulary) - columns)))
+        self.doc_counts = np.pad(self.doc_counts,
+                                 (0, len(self.classes) - len(self.doc_counts)))
+        self._log_probs = None
+
+    def update_counts(self, term_frequencies, doc_counts=None):
+        """
+            Add the word counts of each cluster to the model.
+
+            Args:
+                term_frequencies (dict): A dictionary with the word-frequency
+                                         pairs of each cluster, e.g. from
+                                         `get_cluster_term_frequencies`, or
+                                         a `TermFrequencyAggregator`.
+                doc_counts (dict): The number of tweets of each cluster, used
+                                   for the prior probabilities.
+
+            Returns:
+                NaiveBayesClassifier: The classifier itself.
+        """
+        if isinstance(term_frequencies, TermFrequencyAggregator):
+            term_frequencies = term_frequencies.to_dict()
+        class_ids = self._class_ids(term_frequencies)
+        words_ids = {cluster: [self.vocabulary.add(word)
+                               for word in frequencies]
+                     for cluster, frequencies in term_frequencies.items()}
+        if doc_counts:
+            self._class_ids(doc_counts)
+        self._resize()
+
+        for cluster, frequencies in term_frequencies.items():
+            self.term_counts[class_ids[cluster], words_ids[cluster]] += \
+                np.fromiter(frequencies.values(), dtype=np.float64,
+                            count=len(frequencies))
+        for cluster, count in (doc_counts or {}).items():
+            self.doc_counts[self.classes.index(cluster)] += count
+        return self
+
+    @classmethod
+    def from_term_frequencies(cls, term_frequencies, doc_counts=None,
+                              alpha=1.0):
+        """
+            Train a classifier from the word counts of each cluster.
+
+            Args:
+                term_frequencies (dict): A dictionary with the word-frequency
+                                         pairs of each cluster, e.g. from
+                                         `get_cluster_term_frequencies`, or
+                                         a `TermFrequencyAggregator`.
+                doc_counts (dict): The number of tweets of each cluster. The
+                                   classes are equally likely without it.
+                alpha (float): The additive smoothing of the counts.
+
+            Returns:
+                NaiveBayesClassifier: The trained classifier.
+        """
+        return cls(alpha).update_counts(term_frequencies, doc_counts)
+
+    def partial_fit(self, dataset, text_col='text', cluster_col='sentiment'):
+        """
+            Update the model with a batch of labelled tweets, whose text has
+            already been processed (see `process_dataset`).
+
+            Args:
+                dataset (list): The tweets.
+                text_col (str): The name of the column containing the text
+                                data.
+                cluster_col (str): The name of the column representing the
+                                   clusters.
+
+            Returns:
+                NaiveBayesClassifier: The classifier itself.
+        """
+        labels = [data[cluster_col] for data in dataset]
+        class_ids = self._class_ids(labels)
+        matrix = get_term_matrix(dataset, text_col, self.vocabulary)
+        self._resize()
+
+        label_ids = np.fromiter(map(class_ids.__getitem__, labels),
+                                dtype=np.int64, count=len(labels))
+        num_words = len(self.vocabulary)
+        flat = label_ids[_row_ids(matrix)] * num_words + matrix.indices
+        self.term_counts += np.bincount(
+            flat, weights=matrix.data,
+            minlength=self.term_counts.size).reshape(self.term_counts.shape)
+        self.doc_counts += np.bincount(label_ids,
+                                       minlength=len(self.classes))
+        return self
+
+    def _log_probabilities(self):
+        """
+            The log prior of each class and the log probability of each word
+            in each class.
+        """
+        if self._log_probs is None:
+            if (self.doc_counts > 0).all():
+                log_prior = np.log(self.doc_counts / self.doc_counts.sum())
+            elif (self.doc_counts > 0).any():
+                missing = [cluster for cluster, count in
+                           zip(self.classes, self.doc_counts) if count <= 0]
+                raise ValueError(f"The number of tweets of the classes "
+                                 f"{missing} is unknown, see doc_counts")
+            else:
+                # Without any tweet counts the classes are equally likely
+                log_prior = np.full(len(self.classes),
+                                    -np.log(max(len(self.classes), 1)))
+            smoothed = self.term_counts + self.alpha
+            log_likelihood = np.log(smoothed) - np.log(
+                smoothed.sum(axis=1, keepdims=True))
+            self._log_probs = log_prior, log_likelihood
+        return self._log_probs
+
+    def joint_log_likelihood(self, dataset, text_col='text'):
+        """
+            Get the log of the joint probability of each tweet and each
+            class, up to a constant.
+
+            Args:
+                dataset (list): The tweets, with their text processed.
+                text_col (str): The name of the column containing the text
+                                data.
+
+            Returns:
+                numpy.ndarray: A (tweets, classes) array.
+        """
+        if not self.classes:
+            raise ValueError("The classifier has not been trained")
+        log_prior, log_likelihood = self._log_probabilities()
+
+        matrix = get_term_matrix(dataset, text_col)
+        # Map the words of the batch to the words of the model
+        model_ids = np.fromiter(
+            (self.vocabulary.ids.get(word, -1)
+             for word in matrix.vocabulary.words),
+            dtype=np.int64, count=len(matrix.vocabulary))[matrix.indices]
+        known = model_ids >= 0
+        rows = _row_ids(matrix)[known]
+        counts = matrix.data[known]
+        model_ids = model_ids[known]
+
+        scores = np.empty((len(matrix), len(self.classes)))
+        for i in range(len(self.classes)):
+            scores[:, i] = log_prior[i] + np.bincount(
+                rows, weights=counts * log_likelihood[i, model_ids],
+                minlength=len(matrix))
+        return scores
+
+    def predict_proba(self, dataset, text_col='text'):
+        """
+            Get the probability of each class for each tweet.
+
+            Returns:
+                numpy.ndarray: A (tweets, classes) array whose rows sum 1,
+                               with the classes in the order of `classes`.
+        """
+        scores = self.joint_log_likelihood(dataset, text_col)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, dataset, text_col='text'):
+        """
+            Get the most likely class of each tweet.
+
+            Returns:
+                list: The predicted class of each tweet.
+        """
+        best = self.joint_log_likelihood(dataset, text_col).argmax(axis=1)
+        return [self.classes[i] for i in best.tolist()]
+
+    def save(self, file):
+        """
+            Save the model to a compressed NumPy file. The file is replaced
+            atomically, so a failed save keeps the previous version.
+
+            Args:
+                file (str): Path to the output file.
+        """
+        words = '\n'.join(self.vocabulary.words).encode('utf-8')
+        meta = json.dumps({'alpha': self.alpha, 'classes': self.classes})
+        tmp_file = f'{file}.tmp'
+        with open(tmp_file, 'wb') as output:
+            np.savez_compressed(
+                output, term_counts=self.term_counts,
+                doc_counts=self.doc_counts,
+                words=np.frombuffer(words, dtype=np.uint8),
+                meta=np.frombuffer(meta.encode('utf-8'), dtype=np.uint8))
+        os.replace(tmp_file, file)
+
+    @classmethod
+    def load(cls, file):
+        """
+            Load a model saved with `save`.
 
+            Args:
+                file (str): Path to the saved model.
+
+            Returns:
+                NaiveBayesClassifier: The classifier.
+        """
+        with np.load(file) as arrays:
+            meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+            words = arrays['words'].tobytes().decode('utf-8')
+            classifier = cls(meta['alpha'])
+            classifier.classes = meta['classes']
+            classifier.vocabulary = Vocabulary(words.split('\n')
+                                               if words else ())
+            classifier.term_counts = arrays['term_counts']
+            classifier.doc_counts = arrays['doc_counts']
+        return classifier
+
+
+@instrumented
 def generate_cluster_histograms(term_frequencies, output_dir='histograms',
-                                top_count=20):
+                                top_count=20, headless=False, workers=None):
     """
         Generate histograms for the top words in each cluster based on term
         frequencies.
@@ -390,19 +3745,33 @@ def generate_cluster_histograms(term_frequencies, output_dir='histograms',
                               Default is 'histograms'.
             top_count (int): The number of top words to include in the
                              histogram. Default is 20.
+            headless (bool): Whether to only save the histograms, rendering
+                             them in a pool of processes with a
+                             non-interactive backend, instead of displaying
+                             them.
+            workers (int): Number of worker processes in headless mode.
+                           Defaults to the number of CPUs.
 
     """
 
-    for cluster, frequencies in term_frequencies.items():
+    def cluster_top_words():
+        for cluster, frequencies in term_frequencies.items():
+            yield cluster, _top_words(frequencies, top_count)
+
+    if headless:
+        _render_in_parallel(partial(_render_histogram, top_count=top_count),
+                            cluster_top_words(), output_dir, workers,
+                            'histogram')
+        return
+
+    for cluster, top_words in cluster_top_words():
         print("\nGenerating histogram for cluster ", cluster)
-        word_counts = Counter(frequencies)
-        top_words = word_counts.most_common(top_count)
         words, counts = zip(*top_words)
 
         plt.bar(words, counts)
         plt.xlabel('Words')
         plt.ylabel('Frequency')
-        plt.title(f'Top 20 Words - Cluster {cluster}')
+        plt.title(f'Top {top_count} Words - Cluster {cluster}')
         plt.xticks(rotation=90)
 
         os.makedirs(output_dir, exist_ok=True)